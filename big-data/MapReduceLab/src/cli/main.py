@@ -1,17 +1,18 @@
 import argparse
-from importlib import import_module
+import json
+import tracemalloc
+from dataclasses import asdict
 from pathlib import Path
-from typing import Any, Callable, List, Tuple
+from typing import Optional
 
 from src.core.cluster.coordinator import Coordinator
+from src.core.storage.indexed_output import IndexedOutputReader
+from src.core.storage.job_output import write_output
+from src.core.utils.loading import load_job
+from src.core.utils.metrics import TaskFailed
+from src.core.utils.profiling import Profiler
 from src.runtime.cluster_runtime import ClusterRuntime
-
-
-def load_symbol(path: str) -> Callable[[], Any]:
-    module_path, class_name = path.split(":", 1)
-    mod = import_module(module_path)
-    cls = getattr(mod, class_name)
-    return cls
+from src.runtime.job_server import JobServer, JobSpec, request, wait_for
 
 
 def cmd_run(args: argparse.Namespace) -> None:
@@ -19,11 +20,19 @@ def cmd_run(args: argparse.Namespace) -> None:
     output_dir = Path(args.output)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    cluster = ClusterRuntime(num_workers=args.workers, data_dir=input_dir)
+    if args.trace_memory:
+        tracemalloc.start()
+    profiler = Profiler(output_dir / "profile" if args.profile else None)
+    cluster = ClusterRuntime(
+        num_workers=args.workers,
+        data_dir=input_dir,
+        profiler=profiler,
+        memory_budget=mib_to_bytes(args.memory_budget_mb),
+    )
     cluster.start()
 
-    mapper_cls = load_symbol(args.job.split(",")[0])
-    reducer_cls = load_symbol(args.job.split(",")[1])
+    mapper_cls, reducer_cls = load_job(args.job)
+    scratch_dir = output_dir / "_scratch" if args.checkpoint or args.resume else None
 
     input_files = sorted(input_dir.glob("*.txt"))
     coord = Coordinator(
@@ -32,15 +41,99 @@ def cmd_run(args: argparse.Namespace) -> None:
         num_reducers=args.reducers,
         mapper_factory=mapper_cls,
         reducer_factory=reducer_cls,
+        profiler=profiler,
+        encode_keys=args.encode_keys,
+        target_shard_bytes=kib_to_bytes(args.target_shard_kb),
+        stat_partitions=args.stat_partitions,
+        skew_factor=args.salt_hot_keys,
+        scratch_dir=scratch_dir,
+        resume=args.resume,
+        max_attempts=args.max_attempts,
+        task_timeout=args.task_timeout,
     )
-    results = coord.run(input_files)
+    try:
+        results = coord.run(input_files)
+    except TaskFailed as e:
+        cluster.stop()
+        hint = f" (finished map tasks kept in {scratch_dir}, rerun with --resume)" if scratch_dir else ""
+        raise SystemExit(f"job failed: {e}{hint}")
 
-    out_path = output_dir / "part-00000.txt"
-    with open(out_path, "w", encoding="utf-8") as f:
-        for k, v in sorted(results, key=lambda kv: str(kv[0])):
-            f.write(f"{k}\t{v}\n")
+    with profiler.span("write-output", "coordinator", cat="io"):
+        write_output(output_dir, results, args.output_format, args.block_records)
 
     cluster.stop()
+    if coord.checkpoint is not None:
+        coord.checkpoint.clear()
+    if args.metrics:
+        coord.metrics.write(output_dir / "metrics.json")
+    trace_path = profiler.write_trace()
+    if trace_path is not None:
+        print(f"Profile written to {trace_path.parent}")
+
+
+def mib_to_bytes(mib: Optional[float]) -> Optional[int]:
+    return int(mib * 2**20) if mib is not None else None
+
+
+def kib_to_bytes(kib: Optional[float]) -> Optional[int]:
+    return int(kib * 2**10) if kib is not None else None
+
+
+def cmd_serve(args: argparse.Namespace) -> None:
+    cluster = ClusterRuntime(num_workers=args.workers, memory_budget=mib_to_bytes(args.memory_budget_mb))
+    cluster.start()
+    server = JobServer(cluster, host=args.host, port=args.port, max_concurrent=args.concurrent)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cluster.stop()
+
+
+def cmd_submit(args: argparse.Namespace) -> None:
+    spec = JobSpec(
+        input=str(Path(args.input).resolve()),
+        output=str(Path(args.output).resolve()),
+        job=args.job,
+        reducers=args.reducers,
+        output_format=args.output_format,
+        block_records=args.block_records,
+        target_shard_kb=args.target_shard_kb,
+        salt_hot_keys=args.salt_hot_keys,
+    )
+    reply = request(args.host, args.port, {"cmd": "submit", "spec": asdict(spec)})
+    if not reply["ok"]:
+        raise SystemExit(reply["error"])
+    print(reply["job_id"])
+    if args.wait:
+        for job in wait_for(args.host, args.port, [reply["job_id"]]):
+            print(json.dumps(job, indent=2))
+
+
+def cmd_status(args: argparse.Namespace) -> None:
+    if args.job_id:
+        reply = request(args.host, args.port, {"cmd": "status", "job_id": args.job_id})
+    else:
+        reply = request(args.host, args.port, {"cmd": "list"})
+    if not reply["ok"]:
+        raise SystemExit(reply["error"])
+    print(json.dumps(reply.get("job", reply.get("jobs")), indent=2))
+
+
+def cmd_lookup(args: argparse.Namespace) -> None:
+    path = Path(args.output)
+    if path.is_dir():
+        path = path / "part-00000.idx"
+    with IndexedOutputReader(path) as reader:
+        if args.key is not None:
+            value = reader.get(args.key)
+            if value is None:
+                raise SystemExit(f"key not found: {args.key}")
+            print(f"{args.key}\t{value}")
+        else:
+            for k, v in reader.range(args.start, args.end):
+                print(f"{k}\t{v}")
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -55,10 +148,81 @@ def build_parser() -> argparse.ArgumentParser:
     run.add_argument(
         "--job",
         required=True,
-        help="<mapper_module:MapperClass>,<reducer_module:ReducerClass>",
+        help="<mapper_module:MapperClass>,<reducer_module:ReducerClass> or <module:AggregationJobClass>",
     )
+    run.add_argument("--output-format", choices=["text", "indexed"], default="text")
+    run.add_argument("--block-records", type=int, default=256)
+    run.add_argument(
+        "--profile",
+        action="store_true",
+        help="write per-task cProfile dumps and a Chrome trace to <output>/profile",
+    )
+    run.add_argument(
+        "--no-encode-keys",
+        dest="encode_keys",
+        action="store_false",
+        help="shuffle raw keys instead of per-task dictionary ids",
+    )
+    run.add_argument(
+        "--target-shard-kb",
+        type=float,
+        help="size reduce tasks from map output statistics instead of using --reducers",
+    )
+    run.add_argument("--stat-partitions", type=int, default=64, help="partitions map tasks report sizes for")
+    run.add_argument(
+        "--salt-hot-keys",
+        type=float,
+        metavar="FACTOR",
+        help="spread keys with more than FACTOR x the mean records per reduce task over several "
+        "reducers (associative reducers only)",
+    )
+    run.add_argument(
+        "--checkpoint",
+        action="store_true",
+        help="keep finished map outputs in <output>/_scratch until the job succeeds",
+    )
+    run.add_argument("--resume", action="store_true", help="reuse map outputs checkpointed by a failed run")
+    run.add_argument("--max-attempts", type=int, default=3, help="runs of a failing task before the job fails")
+    run.add_argument("--task-timeout", type=float, help="fail the job when no task finishes for this many seconds")
+    run.add_argument("--metrics", action="store_true", help="write per-task metrics to <output>/metrics.json")
+    run.add_argument("--trace-memory", action="store_true", help="record tracemalloc peaks in task metrics")
+    run.add_argument("--memory-budget-mb", type=float, help="fail a task whose output exceeds this size")
     run.set_defaults(func=cmd_run)
 
+    server = argparse.ArgumentParser(add_help=False)
+    server.add_argument("--host", default="127.0.0.1")
+    server.add_argument("--port", type=int, default=7077)
+
+    serve = sub.add_parser("serve", parents=[server])
+    serve.add_argument("--workers", type=int, default=2)
+    serve.add_argument("--concurrent", type=int, default=1, help="jobs run at once; >1 shares workers fairly")
+    serve.add_argument("--memory-budget-mb", type=float, help="fail a task whose output exceeds this size")
+    serve.set_defaults(func=cmd_serve)
+
+    submit = sub.add_parser("submit", parents=[server])
+    submit.add_argument("--reducers", type=int, default=2)
+    submit.add_argument("--input", required=True)
+    submit.add_argument("--output", required=True)
+    submit.add_argument("--job", required=True)
+    submit.add_argument("--output-format", choices=["text", "indexed"], default="text")
+    submit.add_argument("--block-records", type=int, default=256)
+    submit.add_argument("--target-shard-kb", type=float)
+    submit.add_argument("--salt-hot-keys", type=float, metavar="FACTOR")
+    submit.add_argument("--wait", action="store_true")
+    submit.set_defaults(func=cmd_submit)
+
+    status = sub.add_parser("status", parents=[server])
+    status.add_argument("job_id", nargs="?")
+    status.set_defaults(func=cmd_status)
+
+    lookup = sub.add_parser("lookup")
+    lookup.add_argument("--output", required=True, help="job output dir or .idx file")
+    group = lookup.add_mutually_exclusive_group(required=True)
+    group.add_argument("--key")
+    group.add_argument("--start")
+    lookup.add_argument("--end")
+    lookup.set_defaults(func=cmd_lookup)
+
     return p
 
 
@@ -1,10 +1,19 @@
-from typing import Any, Callable, Dict, List, Tuple
+import queue
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 
 from src.core.cluster.message_bus import MessageBus
+from src.core.cluster.reduce_planner import ReducePlan
 from src.core.cluster.scheduler import Scheduler
+from src.core.storage.checkpoint import MapCheckpoint
 from src.core.storage.partitioner import Partitioner
+from src.core.shuffle.key_dictionary import EncodedPairs, KeyDictionary
 from src.core.shuffle.shuffle_manager import ShuffleManager
+from src.core.shuffle.skew import SaltedKey, plan_salts, unsalt
+from src.core.utils.metrics import JobMetrics, TaskFailed
+from src.core.utils.profiling import Profiler
+from src.core.worker.map_task_executor import MapOptions
 
 
 class Coordinator:
@@ -15,6 +24,18 @@ class Coordinator:
         num_reducers: int,
         mapper_factory: Callable[[], Any],
         reducer_factory: Callable[[], Any],
+        profiler: Optional[Profiler] = None,
+        reply_to: str = "coordinator",
+        max_in_flight: Optional[Callable[[], int]] = None,
+        encode_keys: bool = True,
+        target_shard_bytes: Optional[int] = None,
+        stat_partitions: int = 64,
+        skew_factor: Optional[float] = None,
+        heavy_keys: int = 16,
+        scratch_dir: Optional[Path] = None,
+        resume: bool = False,
+        max_attempts: int = 3,
+        task_timeout: Optional[float] = None,
     ) -> None:
         self.bus = bus
         self.scheduler = Scheduler(worker_names)
@@ -23,30 +44,211 @@ class Coordinator:
         self.reducer_factory = reducer_factory
         self.partitioner = Partitioner()
         self.shuffle = ShuffleManager()
+        self.profiler = profiler or Profiler()
+        self.reply_to = reply_to
+        self.max_in_flight = max_in_flight
+        self.encode_keys = encode_keys
+        self.target_shard_bytes = target_shard_bytes
+        self.stat_partitions = stat_partitions
+        # hot keys are only split when partial results can be merged again
+        self.skew_factor = skew_factor if getattr(reducer_factory, "associative", False) else None
+        self.heavy_keys = heavy_keys
+        self.scratch_dir = scratch_dir
+        self.resume = resume
+        self.max_attempts = max(1, max_attempts)
+        self.task_timeout = task_timeout
+        self.metrics = JobMetrics()
+        self.checkpoint: Optional[MapCheckpoint] = None
 
     def run(self, input_files: List[Path]) -> List[Tuple[Any, Any]]:
-        map_results: List[List[Tuple[Any, Any]]] = []
+        adaptive = self.target_shard_bytes is not None
+        options = MapOptions(
+            encode_keys=self.encode_keys,
+            stat_partitions=self.stat_partitions if adaptive else None,
+            heavy_keys=self.heavy_keys if self.skew_factor is not None else 0,
+        )
+        checkpoint = MapCheckpoint(self.scratch_dir, self.mapper_factory, options) if self.scratch_dir else None
+        self.checkpoint = checkpoint
+        map_results: List[Any] = []
+        map_tasks = []
         for input_file in input_files:
-            worker = self.scheduler.next_worker()
-            self.bus.send(worker, ("MAP", input_file, self.mapper_factory))
-        for _ in input_files:
-            result = self.bus.recv("coordinator")
-            map_results.append(result)
-
-        flattened: List[Tuple[Any, Any]] = [item for sub in map_results for item in sub]
-        by_shard: Dict[int, List[Tuple[Any, Any]]] = {i: [] for i in range(self.num_reducers)}
-        for key, value in flattened:
-            shard = self.partitioner.shard_for_key(key, self.num_reducers)
-            by_shard[shard].append((key, value))
-
-        reduce_results: List[List[Tuple[Any, Any]]] = []
-        for shard, items in by_shard.items():
-            worker = self.scheduler.next_worker()
-            self.bus.send(worker, ("REDUCE", shard, items, self.reducer_factory))
-        for _ in range(self.num_reducers):
-            reduce_results.append(self.bus.recv("coordinator"))
+            saved = checkpoint.load(input_file) if checkpoint and self.resume else None
+            if saved is not None:
+                out, stats = saved
+                self.metrics.add(stats)
+                self.metrics.resumed_tasks += 1
+                map_results.append(out)
+            else:
+                map_tasks.append(("MAP", input_file, self.mapper_factory, self.reply_to, options))
+
+        def save(task: tuple, out: Any, stats: Any) -> None:
+            if checkpoint is not None:
+                checkpoint.save(task[1], out, stats)
+
+        with self.profiler.span("wait-map", "coordinator", cat="bus"):
+            map_results.extend(self._dispatch(map_tasks, on_result=save))
+
+        if adaptive:
+            num_shards, shard_for_key = self._plan_reduce()
+        else:
+            num_shards = self.num_reducers
+            shard_for_key = lambda key: self.partitioner.shard_for_key(key, self.num_reducers)
+        self.metrics.reduce_tasks = num_shards
+
+        salts: Dict[Any, int] = {}
+        if self.skew_factor is not None:
+            salts = plan_salts(
+                [stats.heavy_keys or [] for stats in self.metrics.tasks],
+                sum(stats.records_out for stats in self.metrics.tasks),
+                num_shards,
+                self.skew_factor,
+            )
+            self.metrics.salted_keys = salts
+
+        with self.profiler.span("partition", "coordinator", cat="shuffle"):
+            if self.encode_keys:
+                by_shard: Dict[int, Any] = self._partition_encoded(map_results, num_shards, shard_for_key, salts)
+            else:
+                by_shard = {i: [] for i in range(num_shards)}
+                flattened: List[Tuple[Any, Any]] = [item for sub in map_results for item in sub]
+                turn = 0
+                for key, value in flattened:
+                    shard = shard_for_key(key)
+                    fanout = salts.get(key, 1) if salts else 1
+                    if fanout > 1:
+                        salt = turn % fanout
+                        turn += 1
+                        by_shard[(shard + salt) % num_shards].append((SaltedKey(key, salt), value))
+                    else:
+                        by_shard[shard].append((key, value))
+
+        reduce_tasks = [
+            ("REDUCE", shard, items, self.reducer_factory, self.reply_to)
+            for shard, items in by_shard.items()
+        ]
+        with self.profiler.span("wait-reduce", "coordinator", cat="bus"):
+            reduce_results: List[List[Tuple[Any, Any]]] = self._dispatch(reduce_tasks)
 
         final_out: List[Tuple[Any, Any]] = [item for sub in reduce_results for item in sub]
+        if salts:
+            with self.profiler.span("merge-salted", "coordinator", cat="shuffle"):
+                final_out = self._merge_salted(final_out, salts)
         return final_out
 
+    def _merge_salted(self, results: List[Tuple[Any, Any]], salts: Dict[Any, int]) -> List[Tuple[Any, Any]]:
+        # every salted part of a hot key produced one partial result; reduce them again
+        merged: List[Tuple[Any, Any]] = []
+        partials: Dict[Any, List[Any]] = defaultdict(list)
+        for key, value in results:
+            if key in salts:
+                partials[key].append(value)
+            else:
+                merged.append((key, value))
+        reducer = self.reducer_factory()
+        for key, values in partials.items():
+            reducer.reduce(key, values, lambda k, v: merged.append((k, v)))
+        return merged
+
+    def _plan_reduce(self) -> Tuple[int, Callable[[Any], int]]:
+        partition_bytes = [0] * self.stat_partitions
+        # distinct keys can't be summed across tasks; the largest count is a safe lower bound
+        partition_keys = [0] * self.stat_partitions
+        for stats in self.metrics.tasks:
+            for p, size in enumerate(stats.partition_bytes or []):
+                partition_bytes[p] += size
+            for p, keys in enumerate(stats.partition_keys or []):
+                partition_keys[p] = max(partition_keys[p], keys)
+        assert self.target_shard_bytes is not None
+        plan = ReducePlan(partition_bytes, partition_keys, self.target_shard_bytes, self.partitioner)
+        return plan.num_tasks, plan.task_for_key
 
+    def _partition_encoded(
+        self,
+        map_results: List[EncodedPairs],
+        num_shards: int,
+        shard_for_key: Callable[[Any], int],
+        salts: Dict[Any, int],
+    ) -> Dict[int, EncodedPairs]:
+        # Shards are chosen once per distinct key of each map task; pairs are
+        # then moved with list lookups, re-encoded into one dictionary per shard.
+        # A hot key gets one salted id per shard it is spread over.
+        dictionaries = [KeyDictionary() for _ in range(num_shards)]
+        pairs: List[List[Tuple[int, Any]]] = [[] for _ in range(num_shards)]
+        for task_idx, out in enumerate(map_results):
+            shards: List[int] = []
+            remap: List[int] = []
+            hot: Dict[int, List[Tuple[int, int]]] = {}
+            for key_id, key in enumerate(out.keys):
+                shard = shard_for_key(key)
+                fanout = salts.get(key, 1) if salts else 1
+                if fanout > 1:
+                    targets = [(shard + salt) % num_shards for salt in range(fanout)]
+                    hot[key_id] = [(t, dictionaries[t].encode(SaltedKey(key, salt))) for salt, t in enumerate(targets)]
+                    shards.append(shard)
+                    remap.append(-1)
+                    continue
+                shards.append(shard)
+                remap.append(dictionaries[shard].encode(key))
+            if not hot:
+                for key_id, value in out.pairs:
+                    pairs[shards[key_id]].append((remap[key_id], value))
+                continue
+            turn = dict.fromkeys(hot, task_idx)
+            for key_id, value in out.pairs:
+                routes = hot.get(key_id)
+                if routes is None:
+                    pairs[shards[key_id]].append((remap[key_id], value))
+                else:
+                    shard, salted_id = routes[turn[key_id] % len(routes)]
+                    turn[key_id] += 1
+                    pairs[shard].append((salted_id, value))
+        if salts:
+            return {
+                i: EncodedPairs([unsalt(k) for k in dictionaries[i].keys], pairs[i])
+                for i in range(num_shards)
+            }
+        return {i: EncodedPairs(dictionaries[i].keys, pairs[i]) for i in range(num_shards)}
+
+    def _dispatch(
+        self,
+        tasks: List[tuple],
+        on_result: Optional[Callable[[tuple, Any, Any], None]] = None,
+    ) -> List[Any]:
+        # Without a limit every task is queued up front; with one, tasks are
+        # released as earlier ones finish so concurrent jobs share the workers.
+        # A failed task is queued again until it runs out of attempts, unless
+        # its failure is not retryable.
+        results: List[Any] = []
+        pending = list(tasks)
+        attempts: Dict[int, int] = {id(task): 1 for task in tasks}
+        in_flight = 0
+        failure: Optional[TaskFailed] = None
+        while pending or in_flight:
+            while failure is None and pending and (self.max_in_flight is None or in_flight < self.max_in_flight()):
+                self.bus.send(self.scheduler.next_worker(), pending.pop(0))
+                in_flight += 1
+            if failure is not None and not in_flight:
+                break
+            try:
+                reply = self.bus.recv(self.reply_to, timeout=self.task_timeout)
+            except queue.Empty:
+                raise TaskFailed(f"no task finished within {self.task_timeout}s; {in_flight} still running")
+            in_flight -= 1
+            if isinstance(reply, TaskFailed):
+                task = reply.task
+                if failure is None and reply.retryable and task is not None and attempts.get(id(task), self.max_attempts) < self.max_attempts:
+                    attempts[id(task)] += 1
+                    self.metrics.retried_tasks += 1
+                    pending.append(task)
+                    continue
+                # keep draining so no late reply lands on a released channel
+                failure = failure or reply
+                continue
+            out, stats, task = reply
+            self.metrics.add(stats)
+            results.append(out)
+            if on_result is not None:
+                on_result(task, out, stats)
+        if failure is not None:
+            raise failure
+        return results
@@ -9,6 +9,9 @@ class MessageBus:
     def register(self, name: str) -> None:
         self.queues[name] = queue.Queue()
 
+    def unregister(self, name: str) -> None:
+        self.queues.pop(name, None)
+
     def send(self, name: str, message: Any) -> None:
         self.queues[name].put(message)
 
@@ -0,0 +1,93 @@
+import math
+import sys
+from typing import Any, Dict, List, Tuple, Union
+
+from src.core.shuffle.key_dictionary import EncodedPairs
+from src.core.storage.partitioner import Partitioner
+
+_PAIR_OVERHEAD = 8 + sys.getsizeof((None, None))
+
+
+def partition_sizes(
+    out: Union[List[Tuple[Any, Any]], EncodedPairs],
+    partitioner: Partitioner,
+    num_partitions: int,
+) -> Tuple[List[int], List[int], List[int]]:
+    """Records, estimated bytes and distinct keys of a map output per statistics partition."""
+    records = [0] * num_partitions
+    sizes = [0] * num_partitions
+    keys = [0] * num_partitions
+    if isinstance(out, EncodedPairs):
+        parts = [partitioner.shard_for_key(k, num_partitions) for k in out.keys]
+        for p in parts:
+            keys[p] += 1
+        key_sizes = [sys.getsizeof(k) + _PAIR_OVERHEAD for k in out.keys]
+        for key_id, value in out.pairs:
+            p = parts[key_id]
+            records[p] += 1
+            sizes[p] += key_sizes[key_id] + sys.getsizeof(value)
+    else:
+        seen: Dict[Any, int] = {}
+        for key, value in out:
+            p = seen.get(key)
+            if p is None:
+                p = seen[key] = partitioner.shard_for_key(key, num_partitions)
+                keys[p] += 1
+            records[p] += 1
+            sizes[p] += sys.getsizeof(key) + sys.getsizeof(value) + _PAIR_OVERHEAD
+    return records, sizes, keys
+
+
+class ReducePlan:
+    """
+    Maps statistics partitions onto reduce tasks of roughly `target_bytes`:
+    neighbouring small partitions share a task and an oversized partition is
+    split across several tasks by a second hash of the key, never into more
+    tasks than the partition has distinct keys.
+    """
+
+    def __init__(
+        self,
+        partition_bytes: List[int],
+        partition_keys: List[int],
+        target_bytes: int,
+        partitioner: Partitioner,
+    ) -> None:
+        self.num_partitions = len(partition_bytes)
+        self.partitioner = partitioner
+        self.task_bytes: List[int] = []
+        self._route: Dict[int, Tuple[int, int]] = {}
+        target_bytes = max(1, target_bytes)
+
+        group: List[int] = []
+        group_bytes = 0
+        for p, size in enumerate(partition_bytes):
+            splits = min(math.ceil(size / target_bytes), partition_keys[p])
+            if splits > 1:
+                self._route[p] = (len(self.task_bytes), splits)
+                self.task_bytes.extend([size // splits] * splits)
+                continue
+            if group and group_bytes + size > target_bytes:
+                self._close(group, group_bytes)
+                group, group_bytes = [], 0
+            group.append(p)
+            group_bytes += size
+        if group or not self.task_bytes:
+            self._close(group, group_bytes)
+
+    def _close(self, group: List[int], group_bytes: int) -> None:
+        for p in group:
+            self._route[p] = (len(self.task_bytes), 1)
+        self.task_bytes.append(group_bytes)
+
+    @property
+    def num_tasks(self) -> int:
+        return len(self.task_bytes)
+
+    def task_for_key(self, key: Any) -> int:
+        p = self.partitioner.shard_for_key(key, self.num_partitions)
+        first, splits = self._route[p]
+        if splits == 1:
+            return first
+        # the partition already used hash % num_partitions, so split on the quotient
+        return first + (hash(str(key)) // self.num_partitions) % splits
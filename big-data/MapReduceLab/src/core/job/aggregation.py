@@ -0,0 +1,144 @@
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from src.core.job.mapper import Mapper
+from src.core.job.reducer import Reducer
+
+AGGREGATIONS = ("count", "sum", "min", "max", "mean")
+
+# partial aggregate kept per key: [count, sum, min, max]; the statistics no
+# aggregation of the job needs stay None
+Partial = List[Any]
+
+
+class AggregationJob(ABC):
+    """
+    Declarative job: `extract` turns a record into (key, value) pairs and
+    `aggregations` names the results to compute per key, e.g.
+    {"total": "sum", "avg": "mean"}. Compiled into a combining mapper and a
+    merging reducer by `compile_aggregation`.
+    """
+
+    aggregations: Dict[str, str] = {"count": "count"}
+    # partial aggregates a map task keeps before flushing them to the shuffle
+    max_partials: int = 100_000
+    # extracted values buffered before they are folded into the partials
+    batch_size: int = 100_000
+
+    @abstractmethod
+    def extract(self, record: Any) -> Iterable[Tuple[Any, Any]]:
+        raise NotImplementedError
+
+    def format(self, key: Any, results: Dict[str, Any]) -> Any:
+        if len(results) == 1:
+            return next(iter(results.values()))
+        return " ".join(f"{name}={value}" for name, value in results.items())
+
+
+class AggregationMapper(Mapper):
+    """
+    Buffers extracted values per key and folds each key's batch into its
+    partial with the builtin len/sum/min/max, which run over the whole batch
+    in C instead of updating the partial value by value. Only the statistics
+    the job's aggregations use are computed, so a count job works on values
+    of any type.
+    """
+
+    def __init__(self, job: AggregationJob) -> None:
+        self.job = job
+        wanted = set(job.aggregations.values())
+        self.want_sum = bool(wanted & {"sum", "mean"})
+        self.want_min = "min" in wanted
+        self.want_max = "max" in wanted
+        self.partials: Dict[Any, Partial] = {}
+        self.batch: Dict[Any, List[Any]] = {}
+        self.batched = 0
+
+    def map(self, record: Any, emit: Callable[[Any, Any], None]) -> None:
+        batch = self.batch
+        n = self.batched
+        for key, value in self.job.extract(record):
+            values = batch.get(key)
+            if values is None:
+                batch[key] = [value]
+            else:
+                values.append(value)
+            n += 1
+        self.batched = n
+        if n >= self.job.batch_size:
+            self.fold()
+            if len(self.partials) >= self.job.max_partials:
+                self.cleanup(emit)
+
+    def fold(self) -> None:
+        partials = self.partials
+        want_sum, want_min, want_max = self.want_sum, self.want_min, self.want_max
+        for key, values in self.batch.items():
+            p = partials.get(key)
+            if p is None:
+                partials[key] = [
+                    len(values),
+                    sum(values) if want_sum else None,
+                    min(values) if want_min else None,
+                    max(values) if want_max else None,
+                ]
+                continue
+            p[0] += len(values)
+            if want_sum:
+                p[1] += sum(values)
+            if want_min:
+                low = min(values)
+                if low < p[2]:
+                    p[2] = low
+            if want_max:
+                high = max(values)
+                if high > p[3]:
+                    p[3] = high
+        self.batch = {}
+        self.batched = 0
+
+    def cleanup(self, emit: Callable[[Any, Any], None]) -> None:
+        self.fold()
+        for key, p in self.partials.items():
+            emit(key, tuple(p))
+        self.partials = {}
+
+
+class AggregationReducer(Reducer):
+    def __init__(self, job: AggregationJob) -> None:
+        self.job = job
+
+    def reduce(self, key: Any, values: Iterable[Any], emit: Callable[[Any, Any], None]) -> None:
+        count, total, low, high = 0, 0, None, None
+        for c, s, mn, mx in values:
+            count += c
+            if s is not None:
+                total += s
+            if mn is not None and (low is None or mn < low):
+                low = mn
+            if mx is not None and (high is None or mx > high):
+                high = mx
+        merged = {"count": count, "sum": total, "min": low, "max": high}
+        results = {
+            name: total / count if agg == "mean" else merged[agg]
+            for name, agg in self.job.aggregations.items()
+        }
+        emit(key, self.job.format(key, results))
+
+
+def compile_aggregation(job_factory: Callable[[], AggregationJob]) -> Tuple[Callable[[], Mapper], Callable[[], Reducer]]:
+    job = job_factory()
+    unknown = [agg for agg in job.aggregations.values() if agg not in AGGREGATIONS]
+    if unknown:
+        raise ValueError(f"unknown aggregations {unknown}; expected one of {AGGREGATIONS}")
+    def mapper_factory() -> Mapper:
+        return AggregationMapper(job_factory())
+
+    def reducer_factory() -> Reducer:
+        return AggregationReducer(job)
+
+    # name the factories after the job so checkpoints and traces can tell jobs apart
+    for factory in (mapper_factory, reducer_factory):
+        factory.__module__ = job_factory.__module__
+        factory.__qualname__ = f"{job_factory.__qualname__}.{factory.__name__}"
+    return mapper_factory, reducer_factory
@@ -7,4 +7,7 @@ class Mapper(ABC):
     def map(self, record: Any, emit: Callable[[Any, Any], None]) -> None:
         raise NotImplementedError
 
+    def cleanup(self, emit: Callable[[Any, Any], None]) -> None:
+        """Called once after the last record of the task; may emit buffered pairs."""
+        pass
 
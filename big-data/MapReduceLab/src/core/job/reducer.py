@@ -3,6 +3,10 @@ from typing import Any, Iterable, Callable
 
 
 class Reducer(ABC):
+    # True when reduce() emits one value per key that can be fed back to
+    # reduce() as an input, e.g. a sum; lets the engine split hot keys.
+    associative: bool = False
+
     @abstractmethod
     def reduce(self, key: Any, values: Iterable[Any], emit: Callable[[Any, Any], None]) -> None:
         raise NotImplementedError
@@ -0,0 +1,33 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+
+class KeyDictionary:
+    def __init__(self) -> None:
+        self.keys: List[Any] = []
+        self._ids: Dict[Any, int] = {}
+
+    def encode(self, key: Any) -> int:
+        key_id = self._ids.get(key)
+        if key_id is None:
+            key_id = len(self.keys)
+            self._ids[key] = key_id
+            self.keys.append(key)
+        return key_id
+
+    def decode(self, key_id: int) -> Any:
+        return self.keys[key_id]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+@dataclass
+class EncodedPairs:
+    """Pairs whose keys are ids into `keys`; used for map output and reduce shards."""
+
+    keys: List[Any] = field(default_factory=list)
+    pairs: List[Tuple[int, Any]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.pairs)
@@ -1,15 +1,32 @@
 from collections import defaultdict
-from typing import Dict, List, Any, Iterable
+from typing import Dict, List, Any, Iterable, MutableSequence
 
+from src.core.shuffle.value_buffer import append_value, new_values
 
-class ShuffleManager:
-    def __init__(self) -> None:
-        pass
 
-    def group_by_key(self, mapped_items: Iterable[tuple]) -> Dict[Any, List[Any]]:
-        grouped: Dict[Any, List[Any]] = defaultdict(list)
-        for k, v in mapped_items:
-            grouped[k].append(v)
-        return grouped
+class ShuffleManager:
+    def __init__(self, compact_numeric: bool = True) -> None:
+        self.compact_numeric = compact_numeric
 
+    def group_by_key(self, mapped_items: Iterable[tuple]) -> Dict[Any, MutableSequence[Any]]:
+        if not self.compact_numeric:
+            grouped: Dict[Any, List[Any]] = defaultdict(list)
+            for k, v in mapped_items:
+                grouped[k].append(v)
+            return grouped
 
+        buffers: Dict[Any, MutableSequence[Any]] = {}
+        for k, v in mapped_items:
+            values = buffers.get(k)
+            if values is None:
+                buffers[k] = new_values(v)
+            elif type(values) is list:
+                values.append(v)
+            elif type(v) is int and values.typecode != "d":
+                try:
+                    values.append(v)
+                except OverflowError:
+                    buffers[k] = append_value(values, v)
+            else:
+                buffers[k] = append_value(values, v)
+        return buffers
@@ -0,0 +1,51 @@
+import heapq
+import math
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Tuple, Union
+
+from src.core.shuffle.key_dictionary import EncodedPairs
+
+
+class SaltedKey(NamedTuple):
+    key: Any
+    salt: int
+
+
+def unsalt(key: Any) -> Any:
+    return key.key if type(key) is SaltedKey else key
+
+
+def heavy_keys(out: Union[List[Tuple[Any, Any]], EncodedPairs], top: int) -> List[Tuple[Any, int]]:
+    """The `top` most frequent keys of a map output with their record counts."""
+    if isinstance(out, EncodedPairs):
+        counts = [0] * len(out.keys)
+        for key_id, _ in out.pairs:
+            counts[key_id] += 1
+        best = heapq.nlargest(top, range(len(counts)), key=counts.__getitem__)
+        return [(out.keys[i], counts[i]) for i in best]
+    return Counter(key for key, _ in out).most_common(top)
+
+
+def plan_salts(
+    reported: List[List[Tuple[Any, int]]],
+    total_records: int,
+    num_shards: int,
+    skew_factor: float,
+) -> Dict[Any, int]:
+    """
+    Fan-out per hot key: a key is hot when its records exceed `skew_factor`
+    times the mean records per reduce task, and is spread over enough shards
+    to bring each salted part back under that limit.
+    """
+    counts: Counter = Counter()
+    for task_keys in reported:
+        for key, count in task_keys:
+            counts[key] += count
+    limit = skew_factor * total_records / max(1, num_shards)
+    salts: Dict[Any, int] = {}
+    for key, count in counts.items():
+        if limit and count > limit:
+            fanout = min(num_shards, math.ceil(count / limit))
+            if fanout > 1:
+                salts[key] = fanout
+    return salts
@@ -0,0 +1,54 @@
+from array import array
+from typing import Any, MutableSequence, Sequence
+
+# signed int typecodes from narrowest to widest; a buffer widens on overflow
+_INT_CODES = ("b", "h", "i", "q")
+
+
+def new_values(value: Any) -> MutableSequence[Any]:
+    """Starts a compact buffer for ints/floats and a plain list for anything else."""
+    t = type(value)
+    if t is int:
+        return _widen(array("b"), value)
+    if t is float:
+        return array("d", [value])
+    return [value]
+
+
+def append_value(values: MutableSequence[Any], value: Any) -> MutableSequence[Any]:
+    """Appends value and returns the buffer, which is replaced when it has to change type."""
+    if type(values) is list:
+        values.append(value)
+        return values
+    t = type(value)
+    if values.typecode == "d":
+        if t is float:
+            values.append(value)
+            return values
+    elif t is int:
+        try:
+            values.append(value)
+            return values
+        except OverflowError:
+            return _widen(values, value)
+    out = list(values)
+    out.append(value)
+    return out
+
+
+def _widen(values: "array[int]", value: int) -> MutableSequence[Any]:
+    start = _INT_CODES.index(values.typecode) if values.typecode in _INT_CODES else 0
+    for code in _INT_CODES[start:]:
+        try:
+            wider = values if code == values.typecode else array(code, values)
+            wider.append(value)
+            return wider
+        except OverflowError:
+            continue
+    out = list(values)
+    out.append(value)
+    return out
+
+
+def mean(values: Sequence[Any]) -> float:
+    return sum(values) / len(values)
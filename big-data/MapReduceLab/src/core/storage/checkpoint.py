@@ -0,0 +1,47 @@
+import hashlib
+import os
+import pickle
+import shutil
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+from src.core.utils.metrics import TaskStats
+
+
+class MapCheckpoint:
+    """
+    Persists finished map task outputs in a scratch directory. A checkpoint is
+    only reused for the same input file contents (size and mtime), mapper and
+    map options, so a changed input or job is recomputed.
+    """
+
+    def __init__(self, scratch_dir: Path, mapper_factory: Any, options: Any) -> None:
+        self.scratch_dir = scratch_dir
+        self.job = f"{getattr(mapper_factory, '__module__', '')}:{getattr(mapper_factory, '__qualname__', mapper_factory)}|{options!r}"
+        self.scratch_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, input_file: Path) -> Path:
+        st = os.stat(input_file)
+        ident = f"{Path(input_file).resolve()}|{st.st_size}|{st.st_mtime_ns}|{self.job}"
+        digest = hashlib.sha1(ident.encode("utf-8")).hexdigest()[:16]
+        return self.scratch_dir / f"map-{Path(input_file).stem}-{digest}.pkl"
+
+    def load(self, input_file: Path) -> Optional[Tuple[Any, TaskStats]]:
+        path = self._path(input_file)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def save(self, input_file: Path, out: Any, stats: TaskStats) -> None:
+        path = self._path(input_file)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump((out, stats), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
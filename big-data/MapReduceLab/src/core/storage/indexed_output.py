@@ -0,0 +1,120 @@
+import struct
+import zlib
+from bisect import bisect_right
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b"MRIDX001"
+_LEN = struct.Struct(">I")
+_INDEX_ENTRY = struct.Struct(">QI")
+_FOOTER = struct.Struct(">QI8s")
+
+
+def _pack_str(s: str) -> bytes:
+    data = s.encode("utf-8")
+    return _LEN.pack(len(data)) + data
+
+
+def _unpack_str(buf: bytes, pos: int) -> Tuple[str, int]:
+    (n,) = _LEN.unpack_from(buf, pos)
+    pos += _LEN.size
+    return buf[pos:pos + n].decode("utf-8"), pos + n
+
+
+class IndexedOutputWriter:
+    """
+    Writes key/value pairs sorted by key into zlib-compressed blocks.
+    The file ends with a sparse index (first key of every block) and a
+    fixed-size footer pointing at it.
+    """
+
+    def __init__(self, path: Path, block_records: int = 256, level: int = 6) -> None:
+        self.path = path
+        self.block_records = max(1, block_records)
+        self.level = level
+
+    def write(self, items: Iterable[Tuple[Any, Any]]) -> int:
+        rows = sorted((str(k), str(v)) for k, v in items)
+        index: List[Tuple[str, int, int]] = []
+        with open(self.path, "wb") as f:
+            for i in range(0, len(rows), self.block_records):
+                block = rows[i:i + self.block_records]
+                raw = b"".join(_pack_str(k) + _pack_str(v) for k, v in block)
+                data = zlib.compress(raw, self.level)
+                index.append((block[0][0], f.tell(), len(data)))
+                f.write(data)
+            index_offset = f.tell()
+            index_data = b"".join(
+                _pack_str(key) + _INDEX_ENTRY.pack(offset, length)
+                for key, offset, length in index
+            )
+            f.write(index_data)
+            f.write(_FOOTER.pack(index_offset, len(index), MAGIC))
+        return len(rows)
+
+
+class IndexedOutputReader:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._f = open(path, "rb")
+        self._f.seek(-_FOOTER.size, 2)
+        index_offset, count, magic = _FOOTER.unpack(self._f.read(_FOOTER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an indexed output file")
+        end = self._f.seek(0, 2) - _FOOTER.size
+        self._f.seek(index_offset)
+        buf = self._f.read(end - index_offset)
+        self._keys: List[str] = []
+        self._blocks: List[Tuple[int, int]] = []
+        pos = 0
+        for _ in range(count):
+            key, pos = _unpack_str(buf, pos)
+            offset, length = _INDEX_ENTRY.unpack_from(buf, pos)
+            pos += _INDEX_ENTRY.size
+            self._keys.append(key)
+            self._blocks.append((offset, length))
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "IndexedOutputReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _read_block(self, idx: int) -> Iterator[Tuple[str, str]]:
+        offset, length = self._blocks[idx]
+        self._f.seek(offset)
+        raw = zlib.decompress(self._f.read(length))
+        pos = 0
+        while pos < len(raw):
+            key, pos = _unpack_str(raw, pos)
+            value, pos = _unpack_str(raw, pos)
+            yield key, value
+
+    def _block_for(self, key: str) -> int:
+        return max(0, bisect_right(self._keys, key) - 1)
+
+    def get(self, key: str) -> Optional[str]:
+        if not self._keys:
+            return None
+        for k, v in self._read_block(self._block_for(key)):
+            if k == key:
+                return v
+            if k > key:
+                break
+        return None
+
+    def range(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+        """Yields pairs with start <= key <= end; either bound may be omitted."""
+        first = 0 if start is None else self._block_for(start)
+        for idx in range(first, len(self._blocks)):
+            if end is not None and self._keys[idx] > end:
+                return
+            for k, v in self._read_block(idx):
+                if start is not None and k < start:
+                    continue
+                if end is not None and k > end:
+                    return
+                yield k, v
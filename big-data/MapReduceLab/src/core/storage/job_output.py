@@ -0,0 +1,22 @@
+from pathlib import Path
+from typing import Any, List, Tuple
+
+from src.core.storage.indexed_output import IndexedOutputWriter
+
+
+def write_output(
+    output_dir: Path,
+    results: List[Tuple[Any, Any]],
+    output_format: str = "text",
+    block_records: int = 256,
+) -> Path:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if output_format == "indexed":
+        out_path = output_dir / "part-00000.idx"
+        IndexedOutputWriter(out_path, block_records=block_records).write(results)
+    else:
+        out_path = output_dir / "part-00000.txt"
+        with open(out_path, "w", encoding="utf-8") as f:
+            for k, v in sorted(results, key=lambda kv: str(kv[0])):
+                f.write(f"{k}\t{v}\n")
+    return out_path
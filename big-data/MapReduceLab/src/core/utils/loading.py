@@ -0,0 +1,22 @@
+from importlib import import_module
+from typing import Any, Callable, Tuple
+
+from src.core.job.aggregation import AggregationJob, compile_aggregation
+
+
+def load_symbol(path: str) -> Callable[[], Any]:
+    module_path, class_name = path.split(":", 1)
+    mod = import_module(module_path)
+    cls = getattr(mod, class_name)
+    return cls
+
+
+def load_job(job: str) -> Tuple[Callable[[], Any], Callable[[], Any]]:
+    """Resolves `mapper,reducer` class paths or a single AggregationJob class path."""
+    if "," in job:
+        mapper_path, reducer_path = job.split(",", 1)
+        return load_symbol(mapper_path), load_symbol(reducer_path)
+    spec = load_symbol(job)
+    if not (isinstance(spec, type) and issubclass(spec, AggregationJob)):
+        raise ValueError(f"{job} is not an AggregationJob; pass <mapper>,<reducer> instead")
+    return compile_aggregation(spec)
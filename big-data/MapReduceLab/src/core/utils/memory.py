@@ -0,0 +1,58 @@
+import sys
+import threading
+import tracemalloc
+from typing import Any, Optional
+
+# list slot + 2-tuple header for every emitted pair
+_PAIR_OVERHEAD = 8 + sys.getsizeof((None, None))
+
+
+class MemoryBudgetExceeded(MemoryError):
+    pass
+
+
+class MemoryTracker:
+    """
+    Accounts the bytes a single task keeps in its output list and fails the
+    task once they pass the budget. Sizes are shallow `sys.getsizeof` estimates.
+    """
+
+    # tracemalloc's peak is process-wide; it is only reset while no tracked
+    # task runs, so no task ever loses the peak of its own run
+    _active = 0
+    _active_lock = threading.Lock()
+
+    def __init__(self, task: str, budget_bytes: Optional[int] = None) -> None:
+        self.task = task
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.traced_peak_bytes: Optional[int] = None
+
+    def add(self, key: Any, value: Any) -> None:
+        self._charge(sys.getsizeof(key) + sys.getsizeof(value) + _PAIR_OVERHEAD)
+
+    def add_key(self, key: Any) -> None:
+        # a dictionary-encoded key is stored once, plus its slot in the key list
+        self._charge(sys.getsizeof(key) + 8)
+
+    def _charge(self, size: int) -> None:
+        self.used_bytes += size
+        if self.budget_bytes is not None and self.used_bytes > self.budget_bytes:
+            raise MemoryBudgetExceeded(
+                f"task {self.task} exceeded its memory budget: "
+                f"{self.used_bytes:,} bytes of output > {self.budget_bytes:,} bytes"
+            )
+
+    def start(self) -> None:
+        with MemoryTracker._active_lock:
+            if MemoryTracker._active == 0 and tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            MemoryTracker._active += 1
+
+    def stop(self) -> None:
+        # The peak covers everything traced since the earliest overlapping task
+        # started, so it is an upper bound for this task rather than its own peak.
+        with MemoryTracker._active_lock:
+            if tracemalloc.is_tracing():
+                self.traced_peak_bytes = tracemalloc.get_traced_memory()[1]
+            MemoryTracker._active -= 1
@@ -0,0 +1,61 @@
+import json
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass
+class TaskStats:
+    task: str
+    worker: str
+    records_out: int
+    seconds: float
+    output_bytes: int
+    traced_peak_bytes: Optional[int] = None
+    partition_records: Optional[List[int]] = None
+    partition_bytes: Optional[List[int]] = None
+    partition_keys: Optional[List[int]] = None
+    heavy_keys: Optional[List[Tuple[Any, int]]] = None
+
+
+class TaskFailed(RuntimeError):
+    def __init__(self, message: str, task: Optional[tuple] = None, retryable: bool = True) -> None:
+        super().__init__(message)
+        # the task message, so the coordinator can schedule it again
+        self.task = task
+        # False when running the task again cannot succeed (e.g. memory budget)
+        self.retryable = retryable
+
+
+class JobMetrics:
+    def __init__(self) -> None:
+        self.tasks: List[TaskStats] = []
+        self.reduce_tasks: Optional[int] = None
+        self.salted_keys: Dict[Any, int] = {}
+        self.resumed_tasks = 0
+        self.retried_tasks = 0
+        self._lock = threading.Lock()
+
+    def add(self, stats: TaskStats) -> None:
+        with self._lock:
+            self.tasks.append(stats)
+
+    def summary(self) -> Dict[str, Any]:
+        peaks = [t.traced_peak_bytes for t in self.tasks if t.traced_peak_bytes is not None]
+        largest = max(self.tasks, key=lambda t: t.output_bytes, default=None)
+        return {
+            "tasks": len(self.tasks),
+            "records_out": sum(t.records_out for t in self.tasks),
+            "max_task_output_bytes": largest.output_bytes if largest else 0,
+            "max_task_output": largest.task if largest else None,
+            "max_traced_peak_bytes": max(peaks) if peaks else None,
+            "reduce_tasks": self.reduce_tasks,
+            "resumed_tasks": self.resumed_tasks,
+            "retried_tasks": self.retried_tasks,
+            "salted_keys": {str(k): fanout for k, fanout in self.salted_keys.items()},
+        }
+
+    def write(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"summary": self.summary(), "tasks": [asdict(t) for t in self.tasks]}, f, indent=2)
@@ -0,0 +1,74 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class Profiler:
+    """
+    Collects task spans in Chrome trace-event format and, when an output
+    directory is given, a cProfile dump per task. A profiler without an
+    output directory records nothing.
+    """
+
+    def __init__(self, out_dir: Optional[Path] = None) -> None:
+        self.out_dir = out_dir
+        self.enabled = out_dir is not None
+        self.events: List[Dict[str, Any]] = []
+        self._tids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        if self.out_dir is not None:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+
+    def _tid(self, thread: str) -> int:
+        with self._lock:
+            if thread not in self._tids:
+                self._tids[thread] = len(self._tids)
+            return self._tids[thread]
+
+    @contextmanager
+    def span(self, name: str, thread: str, cat: str = "task", cprofile: bool = False, **args: Any) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        prof = cProfile.Profile() if cprofile else None
+        start = time.perf_counter()
+        if prof is not None:
+            prof.enable()
+        try:
+            yield
+        finally:
+            if prof is not None:
+                prof.disable()
+            end = time.perf_counter()
+            event = {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": self._tid(thread),
+                "args": args,
+            }
+            with self._lock:
+                self.events.append(event)
+            if prof is not None and self.out_dir is not None:
+                prof.dump_stats(self.out_dir / f"{name}.prof")
+
+    def write_trace(self, path: Optional[Path] = None) -> Optional[Path]:
+        if not self.enabled or self.out_dir is None:
+            return None
+        path = path or self.out_dir / "trace.json"
+        meta = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": thread}}
+            for thread, tid in self._tids.items()
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": meta + self.events, "displayTimeUnit": "ms"}, f)
+        return path
@@ -1,19 +1,63 @@
-from typing import Any, Callable, Iterable, List, Tuple
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Union
+
+from src.core.shuffle.key_dictionary import EncodedPairs, KeyDictionary
+from src.core.utils.memory import MemoryTracker
+
+
+@dataclass
+class MapOptions:
+    encode_keys: bool = False
+    # statistics reported back with the task output
+    stat_partitions: Optional[int] = None
+    heavy_keys: int = 0
 
 
 class MapTaskExecutor:
-    def __init__(self, mapper_factory: Callable[[], Any]):
+    def __init__(
+        self,
+        mapper_factory: Callable[[], Any],
+        memory: Optional[MemoryTracker] = None,
+        encode_keys: bool = False,
+    ):
         self.mapper_factory = mapper_factory
+        self.memory = memory
+        self.encode_keys = encode_keys
+
+    def execute(self, records: Iterable[Any]) -> Union[List[Tuple[Any, Any]], EncodedPairs]:
+        if self.encode_keys:
+            return self._execute_encoded(records)
 
-    def execute(self, records: Iterable[Any]) -> List[Tuple[Any, Any]]:
         out: List[Tuple[Any, Any]] = []
+        memory = self.memory
 
         def emit(key: Any, value: Any) -> None:
+            if memory is not None:
+                memory.add(key, value)
             out.append((key, value))
 
         mapper = self.mapper_factory()
         for rec in records:
             mapper.map(rec, emit)
+        mapper.cleanup(emit)
         return out
 
+    def _execute_encoded(self, records: Iterable[Any]) -> EncodedPairs:
+        keys = KeyDictionary()
+        pairs: List[Tuple[int, Any]] = []
+        memory = self.memory
 
+        def emit(key: Any, value: Any) -> None:
+            known = len(keys)
+            key_id = keys.encode(key)
+            if memory is not None:
+                if key_id == known:
+                    memory.add_key(key)
+                memory.add(key_id, value)
+            pairs.append((key_id, value))
+
+        mapper = self.mapper_factory()
+        for rec in records:
+            mapper.map(rec, emit)
+        mapper.cleanup(emit)
+        return EncodedPairs(keys.keys, pairs)
@@ -1,19 +1,29 @@
-from typing import Any, Callable, Dict, Iterable, List, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.core.shuffle.skew import unsalt
+from src.core.utils.memory import MemoryTracker
 
 
 class ReduceTaskExecutor:
-    def __init__(self, reducer_factory: Callable[[], Any]):
+    def __init__(self, reducer_factory: Callable[[], Any], memory: Optional[MemoryTracker] = None):
         self.reducer_factory = reducer_factory
+        self.memory = memory
 
-    def execute(self, grouped: Dict[Any, List[Any]]) -> List[Tuple[Any, Any]]:
+    def execute(self, grouped: Dict[Any, Sequence[Any]], keys: Optional[Sequence[Any]] = None) -> List[Tuple[Any, Any]]:
         out: List[Tuple[Any, Any]] = []
+        memory = self.memory
 
         def emit(key: Any, value: Any) -> None:
+            if memory is not None:
+                memory.add(key, value)
             out.append((key, value))
 
         reducer = self.reducer_factory()
-        for key, values in grouped.items():
-            reducer.reduce(key, values, emit)
+        if keys is None:
+            for key, values in grouped.items():
+                reducer.reduce(unsalt(key), values, emit)
+        else:
+            for key_id, values in grouped.items():
+                reducer.reduce(keys[key_id], values, emit)
         return out
 
-
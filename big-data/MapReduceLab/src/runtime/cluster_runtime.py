@@ -1,28 +1,40 @@
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from src.core.cluster.message_bus import MessageBus
+from src.core.utils.profiling import Profiler
 from src.runtime.worker_runtime import WorkerRuntime
 
 
 class ClusterRuntime:
-    def __init__(self, num_workers: int, data_dir: Path) -> None:
+    def __init__(
+        self,
+        num_workers: int,
+        data_dir: Optional[Path] = None,
+        profiler: Optional[Profiler] = None,
+        memory_budget: Optional[int] = None,
+    ) -> None:
         self.num_workers = num_workers
         self.data_dir = data_dir
+        self.profiler = profiler or Profiler()
+        self.memory_budget = memory_budget
         self.bus = MessageBus()
         self.workers: List[WorkerRuntime] = []
 
     def start(self) -> None:
         self.bus.register("coordinator")
-        files = sorted(self.data_dir.glob("*.txt"))
+        files = sorted(self.data_dir.glob("*.txt")) if self.data_dir else []
         splits = [files[i::self.num_workers] for i in range(self.num_workers)]
         for idx in range(self.num_workers):
             name = f"worker-{idx}"
             self.bus.register(name)
-            worker = WorkerRuntime(name, self.bus, splits[idx])
+            worker = WorkerRuntime(name, self.bus, splits[idx], self.profiler, self.memory_budget)
             worker.start()
             self.workers.append(worker)
 
+    def worker_names(self) -> List[str]:
+        return [worker.name for worker in self.workers]
+
     def stop(self) -> None:
         for idx in range(self.num_workers):
             name = f"worker-{idx}"
@@ -0,0 +1,205 @@
+import itertools
+import json
+import queue
+import socket
+import socketserver
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.core.cluster.coordinator import Coordinator
+from src.core.storage.job_output import write_output
+from src.core.utils.loading import load_job
+from src.runtime.cluster_runtime import ClusterRuntime
+
+
+@dataclass
+class JobSpec:
+    input: str
+    output: str
+    job: str
+    reducers: int = 2
+    output_format: str = "text"
+    block_records: int = 256
+    target_shard_kb: Optional[float] = None
+    salt_hot_keys: Optional[float] = None
+
+
+@dataclass
+class JobStatus:
+    job_id: str
+    spec: JobSpec
+    state: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    records: Optional[int] = None
+    output_path: Optional[str] = None
+    metrics: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class FairShare:
+    """Splits the worker slots evenly between the jobs that are running."""
+
+    def __init__(self, slots: int) -> None:
+        self.slots = slots
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def join(self) -> None:
+        with self._lock:
+            self.active += 1
+
+    def leave(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def share(self) -> int:
+        return max(1, self.slots // max(1, self.active))
+
+
+class JobServer:
+    """
+    Keeps a started ClusterRuntime and runs submitted jobs on it, at most
+    `max_concurrent` at a time. Clients talk to it with one JSON object per line.
+    """
+
+    def __init__(self, cluster: ClusterRuntime, host: str = "127.0.0.1", port: int = 7077, max_concurrent: int = 1) -> None:
+        self.cluster = cluster
+        self.address = (host, port)
+        self.max_concurrent = max(1, max_concurrent)
+        self.fair_share = FairShare(cluster.num_workers)
+        self.jobs: Dict[str, JobStatus] = {}
+        self._queue: "queue.Queue[Optional[JobStatus]]" = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server: Optional[socketserver.ThreadingTCPServer] = None
+
+    def serve_forever(self) -> None:
+        runners = [threading.Thread(target=self._runner, daemon=True) for _ in range(self.max_concurrent)]
+        for runner in runners:
+            runner.start()
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                for line in self.rfile:
+                    cmd = None
+                    try:
+                        req = json.loads(line)
+                        cmd = req.get("cmd")
+                        reply = server.handle_request(req)
+                    except Exception as e:
+                        reply = {"ok": False, "error": str(e)}
+                    self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                    if cmd == "shutdown" and reply.get("ok"):
+                        # only once the reply is out: this daemon thread dies
+                        # with the process as soon as serve_forever returns
+                        server.shutdown()
+                        return
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        with socketserver.ThreadingTCPServer(self.address, Handler) as tcp:
+            tcp.daemon_threads = True
+            # the bound port when 0 was asked for
+            self.address = tcp.server_address[:2]
+            self._server = tcp
+            print(f"Job server listening on {self.address[0]}:{self.address[1]}")
+            tcp.serve_forever()
+        for _ in runners:
+            self._queue.put(None)
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def submit(self, spec: JobSpec) -> JobStatus:
+        with self._lock:
+            job_id = f"job-{next(self._ids)}"
+            status = JobStatus(job_id=job_id, spec=spec)
+            self.jobs[job_id] = status
+        self._queue.put(status)
+        return status
+
+    def handle_request(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        cmd = req.get("cmd")
+        if cmd == "submit":
+            status = self.submit(JobSpec(**req["spec"]))
+            return {"ok": True, "job_id": status.job_id}
+        if cmd == "status":
+            with self._lock:
+                status = self.jobs.get(req["job_id"])
+            if status is None:
+                return {"ok": False, "error": f"unknown job {req['job_id']}"}
+            return {"ok": True, "job": asdict(status)}
+        if cmd == "list":
+            # submit() inserts from other handler threads
+            with self._lock:
+                jobs = list(self.jobs.values())
+            return {"ok": True, "jobs": [asdict(s) for s in jobs]}
+        if cmd == "shutdown":
+            # the connection handler shuts down after sending this reply
+            return {"ok": True}
+        return {"ok": False, "error": f"unknown command {cmd}"}
+
+    def _runner(self) -> None:
+        while True:
+            status = self._queue.get()
+            if status is None:
+                break
+            self._run_job(status)
+
+    def _run_job(self, status: JobStatus) -> None:
+        spec = status.spec
+        reply_to = f"coordinator-{status.job_id}"
+        status.state = "running"
+        status.started_at = time.time()
+        self.cluster.bus.register(reply_to)
+        self.fair_share.join()
+        try:
+            mapper_factory, reducer_factory = load_job(spec.job)
+            coord = Coordinator(
+                bus=self.cluster.bus,
+                worker_names=self.cluster.worker_names(),
+                num_reducers=spec.reducers,
+                mapper_factory=mapper_factory,
+                reducer_factory=reducer_factory,
+                reply_to=reply_to,
+                max_in_flight=self.fair_share.share if self.max_concurrent > 1 else None,
+                target_shard_bytes=int(spec.target_shard_kb * 2**10) if spec.target_shard_kb else None,
+                skew_factor=spec.salt_hot_keys,
+            )
+            try:
+                results = coord.run(sorted(Path(spec.input).glob("*.txt")))
+            finally:
+                status.metrics = coord.metrics.summary()
+            out_path = write_output(Path(spec.output), results, spec.output_format, spec.block_records)
+            status.records = len(results)
+            status.output_path = str(out_path)
+            status.state = "done"
+        except Exception as e:
+            status.error = f"{type(e).__name__}: {e}"
+            status.state = "failed"
+        finally:
+            self.fair_share.leave()
+            self.cluster.bus.unregister(reply_to)
+            status.finished_at = time.time()
+
+
+def request(host: str, port: int, req: Dict[str, Any]) -> Dict[str, Any]:
+    with socket.create_connection((host, port)) as sock:
+        sock.sendall((json.dumps(req) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as f:
+            return json.loads(f.readline())
+
+
+def wait_for(host: str, port: int, job_ids: List[str], poll: float = 0.2) -> List[Dict[str, Any]]:
+    while True:
+        jobs = [request(host, port, {"cmd": "status", "job_id": job_id})["job"] for job_id in job_ids]
+        if all(job["state"] in ("done", "failed") for job in jobs):
+            return jobs
+        time.sleep(poll)
@@ -1,18 +1,35 @@
 import threading
+import time
 from pathlib import Path
-from typing import Any, Callable, Iterable, List, Tuple
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Union
 
 from src.core.cluster.message_bus import MessageBus
+from src.core.cluster.reduce_planner import partition_sizes
 from src.core.storage.local_block_fs import LocalBlockFileSystem
-from src.core.worker.map_task_executor import MapTaskExecutor
+from src.core.worker.map_task_executor import MapOptions, MapTaskExecutor
 from src.core.worker.reduce_task_executor import ReduceTaskExecutor
+from src.core.shuffle.key_dictionary import EncodedPairs
 from src.core.shuffle.shuffle_manager import ShuffleManager
+from src.core.shuffle.skew import heavy_keys
+from src.core.storage.partitioner import Partitioner
+from src.core.utils.memory import MemoryBudgetExceeded, MemoryTracker
+from src.core.utils.metrics import TaskFailed, TaskStats
+from src.core.utils.profiling import Profiler
 
 
 class WorkerRuntime:
-    def __init__(self, name: str, bus: MessageBus, assigned_files: List[Path]) -> None:
+    def __init__(
+        self,
+        name: str,
+        bus: MessageBus,
+        assigned_files: List[Path],
+        profiler: Optional[Profiler] = None,
+        memory_budget: Optional[int] = None,
+    ) -> None:
         self.name = name
         self.bus = bus
+        self.profiler = profiler or Profiler()
+        self.memory_budget = memory_budget
         self.fs = LocalBlockFileSystem(assigned_files)
         self.thread = threading.Thread(target=self._loop, daemon=True)
         self._stop = threading.Event()
@@ -28,21 +45,72 @@ class WorkerRuntime:
             msg = self.bus.recv(self.name)
             tag = msg[0]
             if tag == "MAP":
-                _, input_file, mapper_factory = msg
-                execu = MapTaskExecutor(mapper_factory)
-                records = self._read_records_from_file(input_file)
-                out = execu.execute(records)
-                self.bus.send("coordinator", out)
+                _, input_file, mapper_factory, reply_to, options = msg
+                self._run_task(msg, f"map-{Path(input_file).stem}", reply_to, self._map, input_file, mapper_factory, options)
             elif tag == "REDUCE":
-                _, shard, items, reducer_factory = msg
-                shuffle = ShuffleManager()
-                grouped = shuffle.group_by_key(items)
-                execu = ReduceTaskExecutor(reducer_factory)
-                out = execu.execute(grouped)
-                self.bus.send("coordinator", out)
+                _, shard, items, reducer_factory, reply_to = msg
+                self._run_task(msg, f"reduce-{shard}", reply_to, self._reduce, shard, items, reducer_factory)
             elif tag == "STOP":
                 break
 
+    def _run_task(self, msg: tuple, task: str, reply_to: str, fn: Callable[..., Any], *args: Any) -> None:
+        memory = MemoryTracker(task, self.memory_budget)
+        stats = TaskStats(task=task, worker=self.name, records_out=0, seconds=0.0, output_bytes=0)
+        start = time.perf_counter()
+        memory.start()
+        try:
+            out = fn(stats, memory, *args)
+        except Exception as e:
+            # the same input would blow the same budget again
+            retryable = not isinstance(e, MemoryBudgetExceeded)
+            self.bus.send(reply_to, TaskFailed(f"{task} failed on {self.name}: {type(e).__name__}: {e}", msg, retryable))
+            return
+        finally:
+            memory.stop()
+        stats.records_out = len(out)
+        stats.seconds = time.perf_counter() - start
+        stats.output_bytes = memory.used_bytes
+        stats.traced_peak_bytes = memory.traced_peak_bytes
+        self.bus.send(reply_to, (out, stats, msg))
+
+    def _map(
+        self,
+        stats: TaskStats,
+        memory: MemoryTracker,
+        input_file: Path,
+        mapper_factory: Callable[[], Any],
+        options: MapOptions,
+    ) -> Union[List[Tuple[Any, Any]], EncodedPairs]:
+        execu = MapTaskExecutor(mapper_factory, memory, options.encode_keys)
+        records = self._read_records_from_file(input_file)
+        with self.profiler.span(stats.task, self.name, cprofile=True):
+            out = execu.execute(records)
+        if options.stat_partitions is not None or options.heavy_keys:
+            with self.profiler.span(f"stats-{stats.task}", self.name, cat="shuffle"):
+                if options.stat_partitions is not None:
+                    sizes = partition_sizes(out, Partitioner(), options.stat_partitions)
+                    stats.partition_records, stats.partition_bytes, stats.partition_keys = sizes
+                if options.heavy_keys:
+                    stats.heavy_keys = heavy_keys(out, options.heavy_keys)
+        return out
+
+    def _reduce(
+        self,
+        stats: TaskStats,
+        memory: MemoryTracker,
+        shard: int,
+        items: Union[List[Tuple[Any, Any]], EncodedPairs],
+        reducer_factory: Callable[[], Any],
+    ) -> List[Tuple[Any, Any]]:
+        shuffle = ShuffleManager()
+        keys = items.keys if isinstance(items, EncodedPairs) else None
+        pairs = items.pairs if isinstance(items, EncodedPairs) else items
+        with self.profiler.span(f"group-{shard}", self.name, cat="shuffle", records=len(pairs)):
+            grouped = shuffle.group_by_key(pairs)
+        execu = ReduceTaskExecutor(reducer_factory, memory)
+        with self.profiler.span(stats.task, self.name, cprofile=True, keys=len(grouped)):
+            return execu.execute(grouped, keys)
+
     def _read_records_from_file(self, path: Path) -> Iterable[str]:
         with open(path, "r", encoding="utf-8") as f:
             for line in f:
@@ -0,0 +1,22 @@
+from src.core.job.aggregation import AggregationJob
+from src.student_jobs.word_count.mapper import VOWELS, tokenize
+
+
+class WordCountAggregation(AggregationJob):
+    aggregations = {"count": "count"}
+
+    def extract(self, record):
+        return ((token, 1) for token in tokenize(record))
+
+
+class WordVowelConsonantAggregation(AggregationJob):
+    aggregations = {"vowels": "mean"}
+
+    def extract(self, record):
+        for token in tokenize(record):
+            yield len(token), sum(1 for c in token if c in VOWELS)
+
+    def format(self, key, results):
+        vowel_pct = (results["vowels"] / key) * 100
+        cons_pct = 100 - vowel_pct
+        return f"vowels {vowel_pct:.2f}% consonants {cons_pct:.2f}%"
@@ -1,13 +1,16 @@
 from src.core.job.reducer import Reducer
+from src.core.shuffle.value_buffer import mean
 
 
 class WordCountReducer(Reducer):
+    associative = True
+
     def reduce(self, key, values, emit):
         emit(key, sum(values))
 
 
 class WordVowelConsonantReducer(Reducer):
     def reduce(self, key, values, emit):
-        vowel_pct = (sum(values) / len(values) / key) * 100
+        vowel_pct = (mean(values) / key) * 100
         cons_pct = 100 - vowel_pct
         emit(key, f"vowels {vowel_pct:.2f}% consonants {cons_pct:.2f}%")
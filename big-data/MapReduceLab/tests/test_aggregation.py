@@ -0,0 +1,49 @@
+from collections import defaultdict
+
+from src.core.job.aggregation import AggregationJob, compile_aggregation
+
+
+def run(job_factory, records):
+    """Runs a compiled aggregation over `records` in one map task and one reducer."""
+    mapper_factory, reducer_factory = compile_aggregation(job_factory)
+    mapper = mapper_factory()
+    shuffled = defaultdict(list)
+    emit = lambda key, value: shuffled[key].append(value)
+    for record in records:
+        mapper.map(record, emit)
+    mapper.cleanup(emit)
+    out = {}
+    reducer = reducer_factory()
+    for key, values in shuffled.items():
+        reducer.reduce(key, values, lambda k, v: out.__setitem__(k, v))
+    return out
+
+
+class FirstLetterCount(AggregationJob):
+    """Counts words by first letter; the values are the words themselves."""
+
+    aggregations = {"count": "count"}
+    batch_size = 3
+
+    def extract(self, record):
+        return ((word[0], word) for word in record.split())
+
+
+class LengthStats(AggregationJob):
+    aggregations = {"n": "count", "total": "sum", "low": "min", "high": "max", "avg": "mean"}
+    batch_size = 2
+
+    def extract(self, record):
+        return ((word[0], len(word)) for word in record.split())
+
+
+def test_count_of_string_values():
+    out = run(FirstLetterCount, ["apple avocado banana", "cherry apricot", "blueberry"])
+    assert out == {"a": 3, "b": 2, "c": 1}
+
+
+def test_all_statistics_across_batches():
+    out = run(LengthStats, ["apple avocado banana", "cherry apricot", "blueberry"])
+    assert out["a"] == "n=3 total=19 low=5 high=7 avg=6.333333333333333"
+    assert out["b"] == "n=2 total=15 low=6 high=9 avg=7.5"
+    assert out["c"] == "n=1 total=6 low=6 high=6 avg=6.0"
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+from src.runtime.job_server import request
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# A server without workers in its own process, so that process exits as soon
+# as serve_forever returns, the way `serve` does.
+SERVER = textwrap.dedent("""
+    from src.runtime.job_server import JobServer
+
+    class IdleCluster:
+        num_workers = 2
+
+    JobServer(IdleCluster(), port=0).serve_forever()
+""")
+
+
+def start_server() -> tuple:
+    proc = subprocess.Popen([sys.executable, "-u", "-c", SERVER], cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    assert proc.stdout is not None
+    # "Job server listening on <host>:<port>"
+    port = int(proc.stdout.readline().rsplit(":", 1)[1])
+    return proc, port
+
+
+def test_shutdown_is_acknowledged_before_the_server_exits():
+    for _ in range(5):
+        proc, port = start_server()
+        try:
+            assert request("127.0.0.1", port, {"cmd": "shutdown"}) == {"ok": True}
+            assert proc.wait(timeout=10) == 0
+        finally:
+            proc.kill()
+
+
+def test_unknown_command_is_rejected():
+    proc, port = start_server()
+    try:
+        assert request("127.0.0.1", port, {"cmd": "reboot"}) == {"ok": False, "error": "unknown command reboot"}
+        assert request("127.0.0.1", port, {"cmd": "shutdown"}) == {"ok": True}
+        assert proc.wait(timeout=10) == 0
+    finally:
+        proc.kill()
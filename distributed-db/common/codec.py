@@ -0,0 +1,241 @@
+from __future__ import annotations
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+# Wire format, as with Confluent's serializers: magic byte 0, the schema id as a
+# big-endian u32, then the body. The body packs every fixed-width field with one
+# struct format in schema order and appends strings as u16 length + utf-8.
+MAGIC = 0
+_HEADER = struct.Struct('>bI')
+
+# schema type -> struct code; decimals with a "scale" are sent as scaled ints
+_FIXED = {
+    'u8': 'B', 'u16': 'H', 'i32': 'i', 'i64': 'q',
+    'f32': 'f', 'f64': 'd', 'enum': 'B', 'bool': '?',
+}
+
+
+class SchemaError(ValueError):
+    pass
+
+
+class SchemaRegistry:
+    """
+    File-backed stand-in for a schema registry. Schemas are registered under a
+    subject, get a global id and a per-subject version, and registering an
+    identical schema again returns its existing id.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: list[dict[str, Any]] = []
+        if self.path.exists():
+            self._entries = json.loads(self.path.read_text())['schemas']
+
+    def register(self, subject: str, schema: dict[str, Any]) -> int:
+        with self._lock:
+            versions = [e for e in self._entries if e['subject'] == subject]
+            for e in versions:
+                if e['schema'] == schema:
+                    return e['id']
+            entry = {
+                'id': max((e['id'] for e in self._entries), default=0) + 1,
+                'subject': subject,
+                'version': len(versions) + 1,
+                'schema': schema,
+            }
+            self._entries.append(entry)
+            self._save()
+            return entry['id']
+
+    def get(self, schema_id: int) -> dict[str, Any]:
+        for e in self._entries:
+            if e['id'] == schema_id:
+                return e['schema']
+        # another process may have registered it since we loaded the file
+        if self.path.exists():
+            self._entries = json.loads(self.path.read_text())['schemas']
+            for e in self._entries:
+                if e['id'] == schema_id:
+                    return e['schema']
+        raise SchemaError(f'unknown schema id {schema_id}')
+
+    def latest(self, subject: str) -> tuple[int, dict[str, Any]]:
+        versions = [e for e in self._entries if e['subject'] == subject]
+        if not versions:
+            raise SchemaError(f'no schema registered under {subject}')
+        e = max(versions, key=lambda e: e['version'])
+        return e['id'], e['schema']
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'schemas': self._entries}, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def flatten_fields(fields: list[dict[str, Any]], prefix: tuple[str, ...] = ()) -> list[tuple[tuple[str, ...], dict[str, Any]]]:
+    """(path, field) of every leaf field, nested records expanded, in the
+    order the codec writes them."""
+    out: list[tuple[tuple[str, ...], dict[str, Any]]] = []
+    for f in fields:
+        path = prefix + (f['name'],)
+        if f['type'] == 'record':
+            out.extend(flatten_fields(f['fields'], path))
+        else:
+            out.append((path, f))
+    return out
+
+
+class RecordCodec:
+    """Encodes and decodes dicts of one schema."""
+
+    def __init__(self, schema: dict[str, Any]):
+        self.schema = schema
+        fields = flatten_fields(schema['fields'])
+        self.fixed = [(path, f) for path, f in fields if f['type'] != 'string']
+        self.strings = [path for path, f in fields if f['type'] == 'string']
+        codes: list[str] = []
+        for path, f in self.fixed:
+            if f['type'] not in _FIXED:
+                raise SchemaError(f"unsupported type {f['type']} for {'.'.join(path)}")
+            codes.append(_FIXED[f['type']])
+        self.struct = struct.Struct('<' + ''.join(codes))
+        self._encoders = [self._encoder(f) for _, f in self.fixed]
+        # only enums and scaled decimals need work after unpacking
+        self._decoders = [
+            (i, self._decoder(f)) for i, (_, f) in enumerate(self.fixed)
+            if f['type'] == 'enum' or 'scale' in f
+        ]
+        # where each unpacked value goes in the decoded dict, in schema order
+        slots = {path: i for i, path in enumerate([p for p, _ in self.fixed] + self.strings)}
+        self._plan = self._layout(schema['fields'], slots, ())
+
+    @classmethod
+    def _layout(cls, fields: list[dict[str, Any]], slots: dict[tuple[str, ...], int], prefix: tuple[str, ...]) -> list[tuple[str, Any]]:
+        plan: list[tuple[str, Any]] = []
+        for f in fields:
+            path = prefix + (f['name'],)
+            if f['type'] == 'record':
+                plan.append((f['name'], cls._layout(f['fields'], slots, path)))
+            else:
+                plan.append((f['name'], slots[path]))
+        return plan
+
+    @staticmethod
+    def _encoder(f: dict[str, Any]) -> Callable[[Any], Any]:
+        if f['type'] == 'enum':
+            index = {s: i for i, s in enumerate(f['symbols'])}
+            return index.__getitem__
+        if 'scale' in f:
+            scale = f['scale']
+            return lambda v: round(v * scale)
+        return lambda v: v
+
+    @staticmethod
+    def _decoder(f: dict[str, Any]) -> Callable[[Any], Any]:
+        if f['type'] == 'enum':
+            return f['symbols'].__getitem__
+        if 'scale' in f:
+            # int / power of ten is correctly rounded, so this is exactly the
+            # float the decimal literal would parse to
+            scale = f['scale']
+            return lambda v: v / scale
+        return lambda v: v
+
+    def encode(self, record: dict[str, Any]) -> bytes:
+        values = [enc(_get(record, path)) for enc, (path, _) in zip(self._encoders, self.fixed)]
+        body = self.struct.pack(*values)
+        if not self.strings:
+            return body
+        parts = [body]
+        for path in self.strings:
+            raw = str(_get(record, path)).encode('utf-8')
+            parts.append(struct.pack('<H', len(raw)))
+            parts.append(raw)
+        return b''.join(parts)
+
+    def decode(self, data: bytes | memoryview, offset: int = 0) -> dict[str, Any]:
+        values = list(self.struct.unpack_from(data, offset))
+        for i, dec in self._decoders:
+            values[i] = dec(values[i])
+        pos = offset + self.struct.size
+        for _ in self.strings:
+            (n,) = struct.unpack_from('<H', data, pos)
+            pos += 2
+            values.append(bytes(data[pos:pos + n]).decode('utf-8'))
+            pos += n
+        return _build(self._plan, values)
+
+
+def _build(plan: list[tuple[str, Any]], values: list[Any]) -> dict[str, Any]:
+    return {name: values[slot] if isinstance(slot, int) else _build(slot, values) for name, slot in plan}
+
+
+def _get(record: dict[str, Any], path: tuple[str, ...]) -> Any:
+    value: Any = record
+    for name in path:
+        value = value[name]
+    return value
+
+
+class Serializer:
+    """Registers `schema` under `subject` and frames records with its id."""
+
+    def __init__(self, registry: SchemaRegistry, subject: str, schema: dict[str, Any]):
+        self.schema_id = registry.register(subject, schema)
+        self.codec = RecordCodec(schema)
+        self._header = _HEADER.pack(MAGIC, self.schema_id)
+
+    def __call__(self, record: dict[str, Any]) -> bytes:
+        return self._header + self.codec.encode(record)
+
+
+class Deserializer:
+    """Decodes framed records of any schema id known to the registry."""
+
+    def __init__(self, registry: SchemaRegistry):
+        self.registry = registry
+        self._codecs: dict[int, RecordCodec] = {}
+
+    def __call__(self, data: bytes) -> dict[str, Any]:
+        magic, schema_id = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise SchemaError(f'unknown magic byte {magic}')
+        codec = self._codecs.get(schema_id)
+        if codec is None:
+            codec = self._codecs[schema_id] = RecordCodec(self.registry.get(schema_id))
+        return codec.decode(data, _HEADER.size)
+
+
+def benchmark(records: list[dict[str, Any]], serializer: Serializer, deserializer: Deserializer) -> list[dict[str, Any]]:
+    """Serialize/deserialize throughput and size of JSON vs the binary codec."""
+    formats: list[tuple[str, Callable[[dict[str, Any]], bytes], Callable[[bytes], Any]]] = [
+        ('json', lambda r: json.dumps(r).encode('utf-8'), json.loads),
+        ('binary', serializer, deserializer),
+    ]
+    rows: list[dict[str, Any]] = []
+    for name, encode, decode in formats:
+        start = time.perf_counter()
+        payloads = [encode(r) for r in records]
+        encoded = time.perf_counter() - start
+        start = time.perf_counter()
+        for p in payloads:
+            decode(p)
+        decoded = time.perf_counter() - start
+        rows.append({
+            'format': name,
+            'avg_bytes': sum(len(p) for p in payloads) / len(payloads),
+            'serialize_per_sec': len(records) / encoded,
+            'deserialize_per_sec': len(records) / decoded,
+        })
+    return rows
+
@@ -0,0 +1,75 @@
+from __future__ import annotations
+from collections import Counter
+from typing import Iterable
+
+# Log-linear buckets in the spirit of HdrHistogram: values below 128 are exact,
+# larger ones keep their top 7 significant bits (under 1.6% relative error).
+_SUB_BITS = 7
+_SUB_COUNT = 1 << _SUB_BITS
+
+
+def _index(value: int) -> int:
+    if value < _SUB_COUNT:
+        return value
+    shift = value.bit_length() - _SUB_BITS
+    return (shift << _SUB_BITS) + (value >> shift)
+
+
+def _value(index: int) -> int:
+    shift = index >> _SUB_BITS
+    if shift == 0:
+        return index
+    return ((index & (_SUB_COUNT - 1)) << shift) + (1 << (shift - 1))
+
+
+class LatencyHistogram:
+    """Latency histogram in microseconds; cheap to record, merge and pickle."""
+
+    def __init__(self) -> None:
+        self.counts: Counter[int] = Counter()
+        self.total = 0
+        self.min_us: int | None = None
+        self.max_us = 0
+        self.sum_us = 0
+
+    def record(self, seconds: float, count: int = 1) -> None:
+        """Add `count` samples of `seconds` each."""
+        us = max(0, int(seconds * 1_000_000))
+        self.counts[_index(us)] += count
+        self.total += count
+        self.sum_us += us * count
+        if self.min_us is None or us < self.min_us:
+            self.min_us = us
+        if us > self.max_us:
+            self.max_us = us
+
+    def merge(self, other: LatencyHistogram) -> None:
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.sum_us += other.sum_us
+        if other.min_us is not None and (self.min_us is None or other.min_us < self.min_us):
+            self.min_us = other.min_us
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile(self, pct: float) -> float:
+        """Latency in milliseconds below which `pct` percent of the samples fall."""
+        if not self.total:
+            return 0.0
+        rank = max(1, int(round(pct / 100.0 * self.total)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(_value(index), self.max_us) / 1000.0
+        return self.max_us / 1000.0
+
+    def summary(self, percentiles: Iterable[float] = (50, 95, 99, 99.9)) -> dict[str, float]:
+        out: dict[str, float] = {
+            'count': float(self.total),
+            'avg': (self.sum_us / self.total / 1000.0) if self.total else 0.0,
+            'min': (self.min_us or 0) / 1000.0,
+            'max': self.max_us / 1000.0,
+        }
+        for pct in percentiles:
+            out[f"p{pct:g}".replace('.', '')] = self.percentile(pct)
+        return out
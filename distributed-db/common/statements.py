@@ -0,0 +1,75 @@
+import threading
+import weakref
+from collections import Counter
+
+
+class StatementRegistry:
+    """
+    Prepares each CQL text once per session and hands out the cached
+    PreparedStatement after that, so repeated queries skip parsing on the
+    server. Consistency level and idempotence are set on a statement when it
+    is first prepared. `hits` and `misses` count lookups per CQL text; a miss
+    is a prepare round trip. The registry holds its session weakly, so it
+    does not keep a shut-down session alive.
+    """
+
+    def __init__(self, session):
+        self._session = weakref.ref(session)
+        self.hits = Counter()
+        self.misses = Counter()
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        session = self._session()
+        if session is None:
+            raise ReferenceError('the session of this statement registry is gone')
+        return session
+
+    def prepare(self, query, consistency_level=None, idempotent=None):
+        with self._lock:
+            ps = self._cache.get(query)
+            if ps is not None:
+                self.hits[query] += 1
+                return ps
+        # the round trip runs unlocked so it doesn't stall lookups of other
+        # statements; if two threads race on a new query, the first one wins
+        ps = self.session.prepare(query)
+        if consistency_level is not None:
+            ps.consistency_level = consistency_level
+        if idempotent is not None:
+            ps.is_idempotent = idempotent
+        with self._lock:
+            self.misses[query] += 1
+            return self._cache.setdefault(query, ps)
+
+    def bind(self, query, params=(), fetch_size=None, **options):
+        bound = self.prepare(query, **options).bind(params)
+        if fetch_size is not None:
+            bound.fetch_size = fetch_size
+        return bound
+
+    def execute(self, query, params=(), fetch_size=None, **options):
+        return self.session.execute(self.bind(query, params, fetch_size, **options))
+
+    def stats(self):
+        return {
+            'statements': len(self._cache),
+            'hits': sum(self.hits.values()),
+            'misses': sum(self.misses.values()),
+            'by_statement': {' '.join(q.split()): self.hits[q] for q in self._cache},
+        }
+
+
+_registries = weakref.WeakKeyDictionary()
+_registries_lock = threading.Lock()
+
+
+def statements(session):
+    """The registry of `session`, created on first use."""
+    with _registries_lock:
+        registry = _registries.get(session)
+        if registry is None:
+            registry = _registries[session] = StatementRegistry(session)
+        return registry
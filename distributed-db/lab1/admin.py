@@ -0,0 +1,118 @@
+from __future__ import annotations
+from typing import Any, Iterable, Optional
+from confluent_kafka import Consumer, ConsumerGroupTopicPartitions, KafkaError, KafkaException, TopicPartition
+from confluent_kafka.admin import AdminClient, NewTopic, OffsetSpec
+
+
+class KafkaAdmin:
+    """
+    One AdminClient and one metadata Consumer, created on first use and reused
+    for every topic operation, so each call is a request rather than a JVM.
+    """
+
+    def __init__(self, brokers: str, timeout: float = 30):
+        self.brokers = brokers
+        self.timeout = timeout
+        self._admin: Optional[AdminClient] = None
+        self._consumer: Optional[Consumer] = None
+
+    @property
+    def admin(self) -> AdminClient:
+        if self._admin is None:
+            self._admin = AdminClient({'bootstrap.servers': self.brokers})
+        return self._admin
+
+    @property
+    def consumer(self) -> Consumer:
+        if self._consumer is None:
+            self._consumer = Consumer({
+                'bootstrap.servers': self.brokers,
+                'group.id': 'kafka-admin-metadata',
+                'enable.auto.commit': False,
+            })
+        return self._consumer
+
+    def close(self) -> None:
+        if self._consumer is not None:
+            self._consumer.close()
+        self._admin = None
+        self._consumer = None
+
+    def create_topics(self, topics: Iterable[tuple[str, int, int]]) -> dict[str, Optional[str]]:
+        """Creates (name, partitions, replication) topics in one request; maps each
+        name to an error message, or None when created or already there."""
+        new_topics = [NewTopic(name, num_partitions=p, replication_factor=r) for name, p, r in topics]
+        if not new_topics:
+            return {}
+        futures = self.admin.create_topics(new_topics, operation_timeout=self.timeout, request_timeout=self.timeout)
+        errors: dict[str, Optional[str]] = {}
+        for name, future in futures.items():
+            try:
+                future.result()
+                errors[name] = None
+            except KafkaException as e:
+                err: KafkaError = e.args[0]
+                errors[name] = None if err.code() == KafkaError.TOPIC_ALREADY_EXISTS else str(err)
+        return errors
+
+    def delete_topics(self, names: Iterable[str]) -> dict[str, Optional[str]]:
+        names = list(names)
+        if not names:
+            return {}
+        futures = self.admin.delete_topics(names, operation_timeout=self.timeout, request_timeout=self.timeout)
+        errors: dict[str, Optional[str]] = {}
+        for name, future in futures.items():
+            try:
+                future.result()
+                errors[name] = None
+            except KafkaException as e:
+                errors[name] = str(e.args[0])
+        return errors
+
+    def describe_topics(self, names: Iterable[str]) -> dict[str, dict[str, Any]]:
+        """Partition layout of every topic from a single metadata request."""
+        metadata = self.admin.list_topics(timeout=self.timeout)
+        out: dict[str, dict[str, Any]] = {}
+        for name in names:
+            topic = metadata.topics.get(name)
+            if topic is None or topic.error is not None:
+                out[name] = {'error': str(topic.error) if topic is not None else 'unknown topic'}
+                continue
+            out[name] = {
+                'partitions': [
+                    {'partition': p.id, 'leader': p.leader, 'replicas': list(p.replicas), 'isr': list(p.isrs)}
+                    for p in sorted(topic.partitions.values(), key=lambda p: p.id)
+                ],
+            }
+        return out
+
+    def partitions(self, topic: str) -> list[int]:
+        metadata = self.consumer.list_topics(topic, timeout=self.timeout)
+        return sorted(metadata.topics[topic].partitions)
+
+    def watermarks(self, topic: str) -> list[tuple[int, int]]:
+        """(low, high) offsets of every partition, as two batched ListOffsets requests."""
+        tps = [TopicPartition(topic, p) for p in self.partitions(topic)]
+        low = self.admin.list_offsets({tp: OffsetSpec.earliest() for tp in tps}, request_timeout=self.timeout)
+        high = self.admin.list_offsets({tp: OffsetSpec.latest() for tp in tps}, request_timeout=self.timeout)
+        by_partition = {
+            tp.partition: (low[tp].result().offset, high[tp].result().offset)
+            for tp in low
+        }
+        return [by_partition[p] for p in sorted(by_partition)]
+
+    def message_counts(self, topic: str) -> list[int]:
+        return [high - low for low, high in self.watermarks(topic)]
+
+    def group_lag(self, group: str, topic: str) -> list[int]:
+        """Per-partition lag of a consumer group: high watermark minus committed
+        offset (the whole partition while nothing is committed)."""
+        marks = self.watermarks(topic)
+        request = [ConsumerGroupTopicPartitions(group, [TopicPartition(topic, p) for p in range(len(marks))])]
+        future = self.admin.list_consumer_group_offsets(request, request_timeout=self.timeout)[group]
+        committed = {tp.partition: tp.offset for tp in future.result().topic_partitions}
+        lag: list[int] = []
+        for p, (low, high) in enumerate(marks):
+            offset = committed.get(p, -1)
+            lag.append(high - max(low, offset) if offset >= 0 else high - low)
+        return lag
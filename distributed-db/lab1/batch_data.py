@@ -0,0 +1,197 @@
+from __future__ import annotations
+import argparse
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from common.codec import MAGIC, Deserializer, SchemaError, SchemaRegistry, Serializer, benchmark, flatten_fields
+from data import TELEMETRY_SCHEMA, TELEMETRY_SUBJECT, generate_record
+from loadgen import Payload
+
+_SCHEMA_FIELDS = flatten_fields(TELEMETRY_SCHEMA['fields'])
+_SYMBOLS = {path[-1]: f['symbols'] for path, f in _SCHEMA_FIELDS if f['type'] == 'enum'}
+reactors = _SYMBOLS['device_id']
+statuses = _SYMBOLS['status']
+rod_positions = _SYMBOLS['rod_position']
+
+# (name, low, high, decimals) of the uniform float fields, in generate_record order
+_FLOATS = [
+    ('power_output', 800.0, 1000.0, 2),
+    ('efficiency', 32.0, 35.0, 2),
+    ('temperature', 285.0, 295.0, 2),
+    ('voltage', 21000.0, 23000.0, 2),
+    ('current', 20000.0, 28000.0, 2),
+]
+_LOCATION = [('lat', 47.0, 52.0, 4), ('lon', 30.0, 36.0, 4)]
+_TAIL_FLOATS = [('neutron_flux', 90.0, 100.0, 2), ('pressure', 150.0, 160.0, 2)]
+
+# Same layout as json.dumps(generate_record()). Decimals are written with their
+# fixed precision, which is much cheaper than the shortest repr json.dumps uses.
+_JSON_TEMPLATE = (
+    '{"device_id": %s, '
+    + ''.join(f'"{name}": %.{decimals}f, ' for name, _, _, decimals in _FLOATS)
+    + '"status": %s, "location": {"lat": %.4f, "lon": %.4f}, "maintenance_hours": %d, '
+    + ''.join(f'"{name}": %.{decimals}f, ' for name, _, _, decimals in _TAIL_FLOATS)
+    + '"rod_position": %s, "timestamp": %r}'
+)
+
+# schema type -> numpy type of the codec's little-endian body fields
+_NUMPY = {
+    'u8': '<u1', 'u16': '<u2', 'i32': '<i4', 'i64': '<i8',
+    'f32': '<f4', 'f64': '<f8', 'enum': '<u1', 'bool': '?',
+}
+
+
+def frame_dtype(schema: dict[str, Any]) -> np.dtype[Any]:
+    """Record layout of a codec frame of `schema`: the magic byte and
+    big-endian schema id, then the body fields in schema order, unpadded."""
+    fields: list[tuple[str, str]] = [('magic', '<u1'), ('schema_id', '>u4')]
+    for path, f in flatten_fields(schema['fields']):
+        if f['type'] not in _NUMPY:
+            raise SchemaError(f"no fixed-width layout for {f['type']} field {'.'.join(path)}")
+        fields.append(('.'.join(path), _NUMPY[f['type']]))
+    return np.dtype(fields)
+
+
+# Serializer(TELEMETRY_SCHEMA) frames, so batches and per-record sends share one layout.
+FRAME_DTYPE = frame_dtype(TELEMETRY_SCHEMA)
+
+
+@dataclass
+class TelemetryBatch:
+    """`generate_record` for n records at once, one array per field."""
+    device_id: npt.NDArray[np.uint8]
+    status: npt.NDArray[np.uint8]
+    rod_position: npt.NDArray[np.uint8]
+    maintenance_hours: npt.NDArray[np.int64]
+    timestamp: npt.NDArray[np.float64]
+    floats: dict[str, npt.NDArray[np.float64]]
+
+    def __len__(self) -> int:
+        return len(self.device_id)
+
+    def slice(self, start: int, stop: int) -> TelemetryBatch:
+        return TelemetryBatch(
+            device_id=self.device_id[start:stop],
+            status=self.status[start:stop],
+            rod_position=self.rod_position[start:stop],
+            maintenance_hours=self.maintenance_hours[start:stop],
+            timestamp=self.timestamp[start:stop],
+            floats={name: col[start:stop] for name, col in self.floats.items()},
+        )
+
+    def keys(self) -> list[bytes]:
+        names = [r.encode('utf-8') for r in reactors]
+        return [names[i] for i in self.device_id.tolist()]
+
+    def to_json(self) -> list[bytes]:
+        """One JSON document per record, equal to json.dumps of the dict once parsed."""
+        quoted = {
+            'device_id': [json.dumps(v) for v in reactors],
+            'status': [json.dumps(v) for v in statuses],
+            'rod_position': [json.dumps(v) for v in rod_positions],
+        }
+        columns = (
+            [quoted['device_id'][i] for i in self.device_id.tolist()],
+            *[self.floats[name].tolist() for name, *_ in _FLOATS],
+            [quoted['status'][i] for i in self.status.tolist()],
+            self.floats['lat'].tolist(),
+            self.floats['lon'].tolist(),
+            self.maintenance_hours.tolist(),
+            *[self.floats[name].tolist() for name, *_ in _TAIL_FLOATS],
+            [quoted['rod_position'][i] for i in self.rod_position.tolist()],
+            self.timestamp.tolist(),
+        )
+        template = _JSON_TEMPLATE
+        return [(template % row).encode('utf-8') for row in zip(*columns)]
+
+    def to_binary(self, schema_id: int) -> bytes:
+        """All records back to back as codec frames of TELEMETRY_SCHEMA
+        registered under `schema_id`, byte for byte what Serializer writes."""
+        out = np.empty(len(self), dtype=FRAME_DTYPE)
+        out['magic'] = MAGIC
+        out['schema_id'] = schema_id
+        for path, f in _SCHEMA_FIELDS:
+            name = path[-1]
+            column = self.floats[name] if name in self.floats else getattr(self, name)
+            if 'scale' in f:
+                # np.rint rounds half to even like the codec's round()
+                column = np.rint(column * f['scale'])
+            out['.'.join(path)] = column
+        return out.tobytes()
+
+    def to_binary_records(self, schema_id: int) -> list[bytes]:
+        buf = self.to_binary(schema_id)
+        size = FRAME_DTYPE.itemsize
+        return [buf[i:i + size] for i in range(0, len(buf), size)]
+
+
+def generate_batch(n: int, rng: np.random.Generator | None = None) -> TelemetryBatch:
+    rng = rng or np.random.default_rng()
+    floats = {
+        name: np.round(rng.uniform(low, high, n), decimals)
+        for name, low, high, decimals in _FLOATS + _LOCATION + _TAIL_FLOATS
+    }
+    return TelemetryBatch(
+        device_id=rng.integers(0, len(reactors), n, dtype=np.uint8),
+        status=rng.integers(0, len(statuses), n, dtype=np.uint8),
+        rod_position=rng.integers(0, len(rod_positions), n, dtype=np.uint8),
+        maintenance_hours=rng.integers(1000, 8761, n),
+        timestamp=np.full(n, time.time()),
+        floats=floats,
+    )
+
+
+class BatchPayloads:
+    """
+    PayloadSource drawing each requested run of records with one
+    generate_batch call, keyed by device_id. Values are JSON, or codec frames
+    of TELEMETRY_SCHEMA when its registered `schema_id` is given.
+    """
+
+    def __init__(self, schema_id: int | None = None):
+        self.schema_id = schema_id
+
+    def __call__(self, start: int, count: int) -> list[Payload]:
+        batch = generate_batch(count)
+        values = batch.to_json() if self.schema_id is None else batch.to_binary_records(self.schema_id)
+        return list(zip(batch.keys(), values))
+
+
+def _bench(name: str, n: int, fn: Any) -> None:
+    start = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - start
+    size = sum(len(p) for p in out) / max(1, len(out))
+    print(f"{name:<28} {n / elapsed:>12,.0f} records/sec  {size:6.1f} B/record")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark of telemetry payload generation and the codec (single core)')
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--registry', default=str(Path(__file__).with_name('schemas.json')))
+    args = parser.parse_args()
+    n = args.records
+    registry = SchemaRegistry(args.registry)
+    serializer = Serializer(registry, TELEMETRY_SUBJECT, TELEMETRY_SCHEMA)
+
+    _bench('generate_record+json.dumps', n, lambda: [json.dumps(generate_record(i)).encode('utf-8') for i in range(n)])
+    _bench('generate_record+Serializer', n, lambda: [serializer(generate_record(i)) for i in range(n)])
+    _bench('generate_batch+to_json', n, lambda: generate_batch(n).to_json())
+    _bench('generate_batch+to_binary', n, lambda: generate_batch(n).to_binary_records(serializer.schema_id))
+
+    records = [generate_record(i) for i in range(n)]
+    for row in benchmark(records, serializer, Deserializer(registry)):
+        print(
+            f"{row['format']:<8} {row['avg_bytes']:7.1f} B/record  "
+            f"serialize {row['serialize_per_sec']:>10,.0f}/s  deserialize {row['deserialize_per_sec']:>10,.0f}/s"
+        )
+
+
+if __name__ == '__main__':
+    main()
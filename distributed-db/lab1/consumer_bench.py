@@ -0,0 +1,233 @@
+from __future__ import annotations
+import json
+import multiprocessing as mp
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from common.histogram import LatencyHistogram
+from run_utils import gather, report_result
+
+
+class KafkaConsumerFactory:
+    """Builds one confluent_kafka Consumer per group member (picklable for processes)."""
+
+    def __init__(self, conf: dict[str, Any]):
+        self.conf = conf
+
+    def __call__(self) -> Any:
+        from confluent_kafka import Consumer
+        return Consumer(self.conf)
+
+
+def consumer_conf(brokers: str, group: str) -> dict[str, Any]:
+    return {
+        'bootstrap.servers': brokers,
+        'group.id': group,
+        'auto.offset.reset': 'earliest',
+        'enable.auto.commit': True,
+        # frequent commits so the lag samples follow the group closely
+        'auto.commit.interval.ms': 500,
+    }
+
+
+@dataclass
+class MemberResult:
+    member: int
+    records: int = 0
+    bytes: int = 0
+    # seconds from subscribe() to the first assignment
+    join_seconds: Optional[float] = None
+    # seconds between each revoke and the assignment that followed it
+    rebalance_pauses: list[float] = field(default_factory=list)
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+
+@dataclass
+class GroupResult:
+    topic: str
+    members: int
+    records: int
+    bytes: int
+    elapsed: float
+    latency: LatencyHistogram
+    rebalance_pauses: list[float]
+    join_seconds: list[float]
+    # (seconds since start, lag per partition)
+    lag: list[tuple[float, list[int]]]
+
+    def to_dict(self) -> dict[str, Any]:
+        elapsed = self.elapsed or float('nan')
+        return {
+            'topic': self.topic,
+            'members': self.members,
+            'records': self.records,
+            'elapsed_s': self.elapsed,
+            'records_per_sec': self.records / elapsed,
+            'mb_per_sec': self.bytes / elapsed / (1024 * 1024),
+            'e2e_latency_ms': self.latency.summary(),
+            'join_s': self.join_seconds,
+            'rebalance_pauses_s': self.rebalance_pauses,
+            'lag': [{'t': t, 'partitions': lag, 'total': sum(lag)} for t, lag in self.lag],
+        }
+
+    def report(self) -> str:
+        d = self.to_dict()
+        lat = d['e2e_latency_ms']
+        pauses = self.rebalance_pauses
+        return (
+            f"{self.members} member(s): {self.records} records, "
+            f"{d['records_per_sec']:.1f} records/sec ({d['mb_per_sec']:.2f} MB/sec), "
+            f"e2e latency {lat['p50']:.2f} ms 50th, {lat['p99']:.2f} ms 99th, "
+            f"{len(pauses)} rebalance pause(s), max {max(pauses, default=0.0):.2f} s."
+        )
+
+
+def _member(
+    member: int,
+    consumer_factory: Callable[[], Any],
+    topic: str,
+    target: int,
+    live_since: float,
+    consumed: Any,
+    stop: Any,
+    deserializer: Callable[[bytes], dict[str, Any]],
+) -> MemberResult:
+    result = MemberResult(member)
+    revoked_at: list[float] = []
+    subscribed_at = time.perf_counter()
+
+    def on_assign(consumer: Any, partitions: Any) -> None:
+        now = time.perf_counter()
+        if result.join_seconds is None:
+            result.join_seconds = now - subscribed_at
+        if revoked_at:
+            result.rebalance_pauses.append(now - revoked_at.pop())
+
+    def on_revoke(consumer: Any, partitions: Any) -> None:
+        revoked_at[:] = [time.perf_counter()]
+
+    consumer = None
+    try:
+        consumer = consumer_factory()
+        consumer.subscribe([topic], on_assign=on_assign, on_revoke=on_revoke)
+        while not stop.is_set():
+            batch = 0
+            for msg in consumer.consume(500, 0.2):
+                if msg.error() is not None:
+                    continue
+                value = msg.value() or b''
+                batch += 1
+                result.bytes += len(value)
+                ts = deserializer(value).get('timestamp')
+                # backlog records were produced before the run; only live ones
+                # tell how far behind the producer the group is
+                if ts is not None and ts >= live_since:
+                    result.latency.record(time.time() - ts)
+            if batch:
+                result.records += batch
+                with consumed.get_lock():
+                    consumed.value += batch
+                    if consumed.value >= target:
+                        stop.set()
+    finally:
+        if consumer is not None:
+            consumer.close()
+    return result
+
+
+class ConsumerGroupBench:
+    """
+    Runs `members` consumers of one fresh group, each in its own process,
+    until the group has read `target` records. While they run, `during` (a
+    live producer, say) runs on a thread and the parent samples per-partition
+    lag every `lag_interval` seconds with `lag_fn`. A member that fails or
+    dies stops the group, and run() raises its error.
+    """
+
+    def __init__(
+        self,
+        consumer_factory: Callable[[str], Callable[[], Any]],
+        lag_fn: Optional[Callable[[str], list[int]]] = None,
+        lag_interval: float = 0.5,
+        timeout: float = 120,
+        deserializer: Optional[Callable[[bytes], dict[str, Any]]] = None,
+    ):
+        self.consumer_factory = consumer_factory
+        self.deserializer = deserializer or json.loads
+        self.lag_fn = lag_fn
+        self.lag_interval = lag_interval
+        self.timeout = timeout
+
+    def run(
+        self,
+        topic: str,
+        members: int,
+        target: int,
+        live_since: Optional[float] = None,
+        during: Optional[Callable[[], None]] = None,
+    ) -> GroupResult:
+        group = f'bench-{topic}-{members}-{int(time.time() * 1000)}'
+        ctx = mp.get_context('fork' if os.name == 'posix' else 'spawn')
+        consumed = ctx.Value('q', 0)
+        stop = ctx.Event()
+        results = ctx.Queue()
+        factory = self.consumer_factory(group)
+        since = live_since if live_since is not None else time.time()
+        procs = [
+            ctx.Process(
+                target=report_result,
+                args=(results, m, _member, m, factory, topic, target, since, consumed, stop, self.deserializer),
+                daemon=True,
+            )
+            for m in range(members)
+        ]
+
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        producer = threading.Thread(target=during, daemon=True) if during is not None else None
+        if producer is not None:
+            producer.start()
+        lag: list[tuple[float, list[int]]] = []
+        deadline = start + self.timeout
+        while not stop.wait(self.lag_interval):
+            if self.lag_fn is not None:
+                lag.append((time.perf_counter() - start, self.lag_fn(group)))
+            if time.perf_counter() > deadline:
+                print(f"Timed out after {self.timeout}s with {consumed.value}/{target} records consumed")
+                stop.set()
+            elif not all(p.is_alive() for p in procs):
+                # members only exit once stopped; gather() below raises the error
+                stop.set()
+        elapsed = time.perf_counter() - start
+        if self.lag_fn is not None:
+            lag.append((elapsed, self.lag_fn(group)))
+
+        if producer is not None:
+            producer.join()
+        try:
+            member_results: list[MemberResult] = gather(results, procs)
+        except BaseException:
+            for p in procs:
+                p.terminate()
+            raise
+        finally:
+            for p in procs:
+                p.join()
+        latency = LatencyHistogram()
+        for r in member_results:
+            latency.merge(r.latency)
+        return GroupResult(
+            topic=topic,
+            members=members,
+            records=sum(r.records for r in member_results),
+            bytes=sum(r.bytes for r in member_results),
+            elapsed=elapsed,
+            latency=latency,
+            rebalance_pauses=[p for r in member_results for p in r.rebalance_pauses],
+            join_seconds=[r.join_seconds for r in member_results if r.join_seconds is not None],
+            lag=lag,
+        )
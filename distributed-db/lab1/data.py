@@ -2,6 +2,29 @@ import random, time
 
 reactors = ["REACTOR_ZA_1", "REACTOR_ZA_2", "REACTOR_RV_1", "REACTOR_RV_2"]
 
+TELEMETRY_SUBJECT = "nuclear-telemetry-value"
+TELEMETRY_SCHEMA = {
+    "name": "ReactorTelemetry",
+    "fields": [
+        {"name": "device_id", "type": "enum", "symbols": reactors},
+        {"name": "power_output", "type": "i32", "scale": 100},
+        {"name": "efficiency", "type": "i32", "scale": 100},
+        {"name": "temperature", "type": "i32", "scale": 100},
+        {"name": "voltage", "type": "i32", "scale": 100},
+        {"name": "current", "type": "i32", "scale": 100},
+        {"name": "status", "type": "enum", "symbols": ["normal", "maintenance", "startup", "shutdown"]},
+        {"name": "location", "type": "record", "fields": [
+            {"name": "lat", "type": "i32", "scale": 10000},
+            {"name": "lon", "type": "i32", "scale": 10000},
+        ]},
+        {"name": "maintenance_hours", "type": "u16"},
+        {"name": "neutron_flux", "type": "i32", "scale": 100},
+        {"name": "pressure", "type": "i32", "scale": 100},
+        {"name": "rod_position", "type": "enum", "symbols": ["75pct", "85pct", "95pct"]},
+        {"name": "timestamp", "type": "f64"},
+    ],
+}
+
 def generate_record(i: int = 0):
     reactor = random.choice(reactors)
     return {
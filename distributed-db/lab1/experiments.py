@@ -0,0 +1,209 @@
+from __future__ import annotations
+import csv
+import itertools
+import json
+import math
+import statistics
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from kafka import KafkaClusterManager
+from loadgen import PayloadSource
+
+# two-sided 95% Student t critical values by degrees of freedom
+_T95 = [
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+]
+
+METRICS = [
+    'records_per_sec', 'mb_per_sec', 'avg_record_bytes', 'failed', 'log_bytes',
+    'latency_avg', 'latency_p50', 'latency_p95', 'latency_p99', 'latency_p999',
+]
+
+# parameters of every cell; the experiment's matrix overrides them
+DEFAULTS: dict[str, Any] = {
+    'batch_size': 16384,
+    'linger_ms': 5,
+    'compression': 'none',
+    'partitions': 1,
+    'replication': 1,
+    'record_size': None,
+    # a key of the runner's serializers; 'json' is always there
+    'format': 'json',
+}
+
+
+@dataclass
+class Experiment:
+    name: str
+    # parameter -> values; every combination is one cell of the matrix
+    matrix: dict[str, list[Any]]
+    num_records: int = 500
+    repetitions: int = 3
+    warmup: int = 1
+
+    def cells(self) -> list[dict[str, Any]]:
+        names = list(self.matrix)
+        return [
+            {**DEFAULTS, **dict(zip(names, values))}
+            for values in itertools.product(*(self.matrix[n] for n in names))
+        ]
+
+
+@dataclass
+class RunRecord:
+    experiment: str
+    cell: int
+    params: dict[str, Any]
+    repetition: int
+    metrics: dict[str, float] = field(default_factory=dict)
+
+
+def confidence_interval(values: list[float]) -> tuple[float, float, float, float]:
+    """(mean, stddev, ci95 low, ci95 high) of the samples."""
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, 0.0, mean, mean
+    stddev = statistics.stdev(values)
+    df = len(values) - 1
+    t = _T95[df - 1] if df <= len(_T95) else 1.96
+    half = t * stddev / math.sqrt(len(values))
+    return mean, stddev, mean - half, mean + half
+
+
+def summarize(records: list[RunRecord]) -> list[dict[str, Any]]:
+    by_cell: dict[int, list[RunRecord]] = {}
+    for r in records:
+        by_cell.setdefault(r.cell, []).append(r)
+    rows: list[dict[str, Any]] = []
+    for cell, runs in sorted(by_cell.items()):
+        row: dict[str, Any] = {'experiment': runs[0].experiment, 'cell': cell, **runs[0].params, 'n': len(runs)}
+        for metric in METRICS:
+            values = [r.metrics[metric] for r in runs if metric in r.metrics]
+            if not values:
+                continue
+            mean, stddev, low, high = confidence_interval(values)
+            row[f'{metric}_mean'] = mean
+            row[f'{metric}_stddev'] = stddev
+            row[f'{metric}_ci95_low'] = low
+            row[f'{metric}_ci95_high'] = high
+        rows.append(row)
+    return rows
+
+
+def padded(data_generator: Callable[[int], dict[Any, Any]], record_size: Optional[int]) -> Callable[[int], dict[Any, Any]]:
+    """Wraps a generator so each JSON record is padded up to `record_size` bytes."""
+    if not record_size:
+        return data_generator
+
+    def generate(i: int) -> dict[Any, Any]:
+        record = data_generator(i)
+        # len(', "padding": ""') == 15
+        missing = record_size - len(json.dumps(record)) - 15
+        if missing > 0:
+            record['padding'] = 'x' * missing
+        return record
+    return generate
+
+
+class ExperimentRunner:
+    """
+    Runs every cell of an experiment's matrix against a started cluster:
+    `warmup` discarded runs, then `repetitions` measured ones, each producing
+    `num_records` records. Results are written as JSON (raw runs and summary)
+    and CSV (summary) into `out_dir`. Cells without a record_size draw their
+    records from `payloads[format]` when the runner has a source for it.
+    """
+
+    def __init__(
+        self,
+        kcm: KafkaClusterManager,
+        out_dir: Path,
+        serializers: Optional[dict[str, Callable[[dict[Any, Any]], bytes]]] = None,
+        payloads: Optional[dict[str, PayloadSource]] = None,
+    ):
+        self.kcm = kcm
+        self.out_dir = out_dir
+        self.serializers: dict[str, Optional[Callable[[dict[Any, Any]], bytes]]] = {'json': None, **(serializers or {})}
+        self.payloads = payloads or {}
+
+    def run(self, experiment: Experiment, data_generator: Callable[[int], dict[Any, Any]]) -> list[dict[str, Any]]:
+        cells = experiment.cells()
+        for params in cells:
+            # padding is a JSON field; a binary codec drops fields outside its schema
+            if params['record_size'] and params['format'] != 'json':
+                raise ValueError(f"record_size only pads JSON records, not format={params['format']!r}")
+        topics = [f'{experiment.name}-{i}' for i in range(len(cells))]
+        self.kcm.create_topics([(t, p['partitions'], p['replication']) for t, p in zip(topics, cells)])
+
+        records: list[RunRecord] = []
+        for i, (topic, params) in enumerate(zip(topics, cells)):
+            print(f"\n=== {experiment.name} [{i + 1}/{len(cells)}] {self._label(params)} ===\n")
+            generator = padded(data_generator, params['record_size'])
+            for rep in range(-experiment.warmup, experiment.repetitions):
+                metrics = self._run_once(topic, params, generator, experiment.num_records)
+                if rep >= 0:
+                    records.append(RunRecord(experiment.name, i, params, rep, metrics))
+
+        summary = summarize(records)
+        self._write(experiment, records, summary)
+        return summary
+
+    def _run_once(
+        self,
+        topic: str,
+        params: dict[str, Any],
+        data_generator: Callable[[int], dict[Any, Any]],
+        num_records: int,
+    ) -> dict[str, float]:
+        size_before = self._log_bytes(topic, params['partitions'])
+        result = self.kcm.producer_perf_test(
+            topic=topic,
+            num_records=num_records,
+            data_generator=data_generator,
+            compression=params['compression'],
+            batch_size=params['batch_size'],
+            linger_ms=params['linger_ms'],
+            serializer=self.serializers[params['format']],
+            payloads=None if params['record_size'] else self.payloads.get(params['format']),
+        )
+        d = result.to_dict()
+        metrics: dict[str, float] = {
+            'records_per_sec': d['records_per_sec'],
+            'mb_per_sec': d['mb_per_sec'],
+            'avg_record_bytes': d['avg_record_bytes'],
+            'failed': d['failed'],
+            'log_bytes': self._log_bytes(topic, params['partitions']) - size_before,
+        }
+        for name, value in d['latency_ms'].items():
+            if name != 'count':
+                metrics[f'latency_{name}'] = value
+        return metrics
+
+    def _log_bytes(self, topic: str, partitions: int) -> int:
+        return sum(self.kcm.topic_partition_size(topic, p) for p in range(partitions))
+
+    def _label(self, params: dict[str, Any]) -> str:
+        return ', '.join(f'{k}={v}' for k, v in params.items())
+
+    def _write(self, experiment: Experiment, records: list[RunRecord], summary: list[dict[str, Any]]) -> None:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        json_path = self.out_dir / f'{experiment.name}.json'
+        csv_path = self.out_dir / f'{experiment.name}.csv'
+        with open(json_path, 'w') as f:
+            json.dump({
+                'experiment': asdict(experiment),
+                'runs': [asdict(r) for r in records],
+                'summary': summary,
+            }, f, indent=2)
+        columns: list[str] = []
+        for row in summary:
+            columns.extend(k for k in row if k not in columns)
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(summary)
+        print(f"Results written to {json_path} and {csv_path}")
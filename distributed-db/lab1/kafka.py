@@ -1,12 +1,21 @@
 import json
 import os
+import re
 import signal
 import subprocess
 import time
 from pathlib import Path
 from run_utils import run
 from typing import Dict, Callable, Any, Optional
-from confluent_kafka import Producer, KafkaError, Consumer, TopicPartition
+
+from common.codec import SchemaRegistry
+from confluent_kafka import Producer
+from admin import KafkaAdmin
+from consumer_bench import ConsumerGroupBench, GroupResult, KafkaConsumerFactory, consumer_conf
+from probe import parse_address, wait_for_ports
+from loadgen import KafkaSinkFactory, LoadConfig, LoadResult, PayloadSource, ProducerSink, producer_conf, run_load
+from segments import ReplicaStats, scan
+from sender import ParallelSender, send_serial
 
 
 class KafkaClusterManager:
@@ -30,6 +39,9 @@ class KafkaClusterManager:
         self.logs_dir = self.workdir / 'logs'
         self.proc_info_file = self.workdir / 'processes.json'
         self.cluster_id_file = self.workdir / 'cluster.id'
+        self._admin: Optional[KafkaAdmin] = None
+        # outside the cluster dir, so schema ids survive clean()
+        self.schema_registry = SchemaRegistry(self.workdir.parent / 'schemas.json')
         self._ensure_dirs()
 
     def init(self):
@@ -50,10 +62,12 @@ class KafkaClusterManager:
         return ok
 
     def stop(self):
+        self._close_admin()
         self._stop_nodes()
 
     def clean(self):
         # stop then remove workdir
+        self._close_admin()
         self._stop_nodes()
         print('Removing workdir', self.workdir)
         for p in self.workdir.glob('*'):
@@ -95,96 +109,154 @@ class KafkaClusterManager:
         else:
             print('No process info (not started with this tool or already stopped).')
 
+    @property
+    def admin(self) -> KafkaAdmin:
+        if self._admin is None:
+            self._admin = KafkaAdmin(self.brokers_str())
+        return self._admin
+
+    def create_topics(self, topics: list[tuple[str, int, int]]):
+        for name, err in self.admin.create_topics(topics).items():
+            if err is not None:
+                print(f"Create topic '{name}' err={err}")
+            else:
+                print(f"Created topic {name}.")
+
     def create_topic(self, topic: str, partitions: int = 1, replication: int = 1):
-        bootstrap = self.brokers()[0]
-        cmd = [self._kafka_bin('kafka-topics.sh'), '--create', '--topic', topic, '--partitions', str(partitions), '--replication-factor', str(replication), '--bootstrap-server', bootstrap]
-        rc, out, err = run(cmd, capture=True, check=False)
-        print(out)
-        if rc != 0 and err:
-            print(f"Create topic '{topic}' rc={rc} err={err}")
+        self.create_topics([(topic, partitions, replication)])
+
+    def describe_topics(self, topics: list[str]):
+        for name, desc in self.admin.describe_topics(topics).items():
+            if 'error' in desc:
+                print(f"Describe topic '{name}' err={desc['error']}")
+                continue
+            parts = desc['partitions']
+            replication = len(parts[0]['replicas']) if parts else 0
+            print(f"Topic: {name}\tPartitionCount: {len(parts)}\tReplicationFactor: {replication}")
+            for p in parts:
+                replicas = ','.join(map(str, p['replicas']))
+                isr = ','.join(map(str, p['isr']))
+                print(f"\tTopic: {name}\tPartition: {p['partition']}\tLeader: {p['leader']}\tReplicas: {replicas}\tIsr: {isr}")
 
     def describe_topic(self, topic: str):
-        bootstrap = self.brokers()[0]
-        cmd = [
-            self._kafka_bin('kafka-topics.sh'),
-            '--describe',
-            '--topic', topic,
-            '--bootstrap-server', bootstrap
-        ]
-        rc, out, err = run(cmd, capture=True, check=False)
-        print(out)
-        if err:
-            print(f"Describe topic '{topic}' rc={rc} err={err}")
+        self.describe_topics([topic])
 
-    def create_producer(self) -> Producer:
-        conf = {
+    def producer_config(self) -> dict[str, Any]:
+        return {
             "bootstrap.servers": self.brokers_str(),
             "acks": "all",
             "retries": 5,
+            # retried batches keep their place, so per-key order survives retries
+            "enable.idempotence": True,
             "message.timeout.ms": 600_000,
             "delivery.timeout.ms": 600_000,
         }
 
-        producer = Producer(conf)
+    def create_producer(self) -> Producer:
+        producer = Producer(self.producer_config())
         return producer
 
     def send_messages(
         self,
-        producer: Producer,
+        producer: Optional[Producer],
         topic: str,
         data_generator: Callable[[int], dict[Any, Any]],
         num_messages: int,
-        flush_every: int = 50
-    ) -> None:
-        def delivery_report(err: Optional[KafkaError], msg: Any):
-            if err is not None:
-                print(f"Message delivery failed: {err}")
-
-        for i in range(num_messages):
-            record = data_generator(i)
-            producer.produce(
-                topic=topic,
-                value=json.dumps(record).encode("utf-8"),
-                callback=delivery_report
+        flush_every: int = 50,
+        processes: int = 1,
+        key_field: Optional[str] = 'device_id',
+        serializer: Optional[Callable[[dict[Any, Any]], bytes]] = None,
+        payloads: Optional[PayloadSource] = None,
+    ) -> LoadResult:
+        """
+        Sends `num_messages` generated records. With `processes` > 1 they are
+        fanned out to sender processes with a producer each (`producer` is then
+        unused); records sharing a `key_field` value keep their order. Values
+        are JSON unless a `serializer` (see codec.Serializer) is given. A
+        `payloads` source (see batch_data.BatchPayloads) replaces the
+        generator, key field and serializer.
+        """
+        if processes > 1:
+            sender = ParallelSender(KafkaSinkFactory(self.producer_config()), processes=processes)
+            result = sender.send(
+                topic, data_generator, num_messages, key_field,
+                progress_every=flush_every, serializer=serializer, payloads=payloads,
+            )
+        else:
+            result = send_serial(
+                producer or self.create_producer(), topic, data_generator, num_messages, key_field,
+                progress_every=flush_every, serializer=serializer, payloads=payloads,
             )
-            producer.poll(0)
-
-            if (i + 1) % flush_every == 0:
-                print(f"{i + 1}/{num_messages} messages queued.")
 
-        producer.flush()
-        print("All messages sent successfully.")
+        for err, count in result.errors.items():
+            print(f"Message delivery failed ({count}x): {err}")
+        if result.failed:
+            print(f"{result.acked}/{result.sent} messages delivered.")
+        else:
+            print("All messages sent successfully.")
+        print(result.report())
+        return result
 
     def producer_perf_test(
         self,
         topic: str,
         num_records: int,
-        record_size: int,
+        data_generator: Callable[[int], dict[Any, Any]],
         compression: str = "none",
         throughput: int = -1,
         batch_size: int = 16384,
         linger_ms: int = 5,
-    ):
-        props = [
-            f"acks=all",
-            f"batch.size={batch_size}",
-            f"linger.ms={linger_ms}",
-            f"compression.type={compression}",
-            f"bootstrap.servers={self.brokers_str()}"
-        ]
-        cmd = [
-            self._kafka_bin('kafka-producer-perf-test.sh'),
-            '--topic', topic,
-            '--num-records', str(num_records),
-            '--record-size', str(record_size),
-            '--throughput', str(throughput),
-            '--producer-props',
-            *props
-        ]
-        rc, out, err = run(cmd, capture=True, check=False)
-        print(out)
-        if rc != 0 and err:
-            print(f"Test producer performance '{topic}' rc={rc} err={err}")
+        threads: int = 1,
+        processes: int = 1,
+        sink_factory: Optional[Callable[[], ProducerSink]] = None,
+        serializer: Optional[Callable[[dict[Any, Any]], bytes]] = None,
+        payloads: Optional[PayloadSource] = None,
+    ) -> LoadResult:
+        config = LoadConfig(
+            topic=topic,
+            num_records=num_records,
+            threads=threads,
+            processes=processes,
+            target_rate=throughput,
+            serializer=serializer,
+            payloads=payloads,
+        )
+        conf = producer_conf(self.brokers_str(), batch_size, linger_ms, compression)
+        result = run_load(config, sink_factory or KafkaSinkFactory(conf), data_generator)
+        print(result.report())
+        return result
+
+    def consumer_group_test(
+        self,
+        topic: str,
+        members: int,
+        target: int,
+        live_records: int = 0,
+        live_rate: float = -1,
+        data_generator: Optional[Callable[[int], dict[Any, Any]]] = None,
+        consumer_factory: Optional[Callable[[str], Callable[[], Any]]] = None,
+        sink_factory: Optional[Callable[[], ProducerSink]] = None,
+        serializer: Optional[Callable[[dict[Any, Any]], bytes]] = None,
+        deserializer: Optional[Callable[[bytes], dict[str, Any]]] = None,
+    ) -> GroupResult:
+        """
+        Consumes `target` records of `topic` with a fresh group of `members`.
+        With `live_records`, that many more are produced at `live_rate` while
+        the group runs; their embedded timestamps give the end-to-end latency.
+        """
+        bench = ConsumerGroupBench(
+            consumer_factory or (lambda group: KafkaConsumerFactory(consumer_conf(self.brokers_str(), group))),
+            lag_fn=(lambda group: self.admin.group_lag(group, topic)) if consumer_factory is None else None,
+            deserializer=deserializer,
+        )
+        during = None
+        if live_records and data_generator is not None:
+            config = LoadConfig(topic=topic, num_records=live_records, target_rate=live_rate, pregenerate=0, serializer=serializer)
+            conf = producer_conf(self.brokers_str())
+            during = lambda: run_load(config, sink_factory or KafkaSinkFactory(conf), data_generator)
+        result = bench.run(topic, members, target + live_records, during=during)
+        print(result.report())
+        return result
 
     def topic_partition_size(self, topic: str, partition: int = 0) -> int:
         total_size = 0
@@ -202,15 +274,14 @@ class KafkaClusterManager:
 
         return total_size
 
+    def analyze_segments(self, topics: Optional[list[str]] = None) -> list[ReplicaStats]:
+        return scan(self.data_dir, topics)
+
     def topic_partition_messages(self, topic: str, partition: int = 0) -> int:
-        c = Consumer({
-            'bootstrap.servers': self.brokers_str(),
-            'group.id': 'dummy',
-            'auto.offset.reset': 'earliest'
-        })
-        tp = TopicPartition(topic, partition)
-        low, high = c.get_watermark_offsets(tp)
-        return high - low
+        return self.topic_message_counts(topic)[partition]
+
+    def topic_message_counts(self, topic: str) -> list[int]:
+        return self.admin.message_counts(topic)
 
     def _write_configs(self):
         controller_quorum = self._controller_quorum_voters()
@@ -252,6 +323,8 @@ class KafkaClusterManager:
                 print(f"Formatted node {n}")
 
     def _start_nodes(self):
+        # Popen returns right away, so all nodes boot concurrently; readiness is
+        # left to _wait_for_quorum
         procs: Dict[str, object] = {}
         for n in range(1, self.nodes + 1):
             conf = str(self._node_config_path(n))
@@ -260,27 +333,36 @@ class KafkaClusterManager:
             print('Starting node', n, '-> log:', self._node_log(n))
             p = subprocess.Popen(cmd, stdout=logf, stderr=subprocess.STDOUT)
             procs[str(n)] = {'pid': p.pid, 'conf': conf, 'log': str(self._node_log(n))}
-            # small delay so logs start writing and ports free up sequentially
-            time.sleep(0.5)
         self.proc_info_file.write_text(json.dumps(procs, indent=2, sort_keys=True))
         print('Started nodes, process info recorded to', self.proc_info_file)
         return procs
 
     def _wait_for_quorum(self, timeout: int = 30) -> bool:
-        deadline = time.time() + timeout
-        controllers = [f"localhost:{self.base_controller_port + (n-1)}" for n in range(1, self.nodes + 1)]
-        last_err = None
-        while time.time() < deadline:
-            for c in controllers:
-                cmd = [self._kafka_bin('kafka-metadata-quorum.sh'), '--bootstrap-controller', c, 'describe', '--status']
-                rc, out, err = run(cmd, capture=True, check=False)
-                if rc == 0 and 'LeaderId' in out or 'Leader' in out:
-                    print('Quorum OK via controller', c)
-                    return True
-                last_err = (rc, out, err)
+        endpoints = self.endpoints()
+        addresses = [parse_address(e) for e in endpoints['controllers'] + endpoints['brokers']]
+        start = time.time()
+        deadline = start + timeout
+        closed = wait_for_ports(addresses, timeout=timeout)
+        if closed:
+            print('Timed out with ports still closed:', ', '.join(f'{h}:{p}' for h, p in closed))
+            return False
+        print(f'All broker and controller ports accepting connections after {time.time() - start:.1f}s')
+        # open ports don't mean the controllers have elected a leader yet. The
+        # quorum tool starts a JVM per call, so it is retried with a pause.
+        controller = endpoints['controllers'][0]
+        cmd = [self._kafka_bin('kafka-metadata-quorum.sh'), '--bootstrap-controller', controller, 'describe', '--status']
+        while True:
+            try:
+                rc, out, err = run(cmd, capture=True, check=False, timeout=max(5.0, deadline - time.time()))
+            except subprocess.TimeoutExpired:
+                rc, out, err = -1, '', 'kafka-metadata-quorum.sh timed out'
+            if rc == 0 and re.search(r'LeaderId:\s*\d+', out):
+                print(f'Quorum OK via controller {controller} after {time.time() - start:.1f}s')
+                return True
+            if time.time() + 1 >= deadline:
+                print('Timed out waiting for quorum. Last error:', (rc, out, err))
+                return False
             time.sleep(1)
-        print('Timed out waiting for quorum. Last error:', last_err)
-        return False
 
     def _stop_nodes(self):
         if not self.proc_info_file.exists():
@@ -300,6 +382,11 @@ class KafkaClusterManager:
         except Exception:
             pass
 
+    def _close_admin(self):
+        if self._admin is not None:
+            self._admin.close()
+            self._admin = None
+
     def _generate_cluster_id(self) -> str:
         # use kafka-storage.sh random-uuid
         cmd = [self._kafka_bin('kafka-storage.sh'), 'random-uuid']
@@ -0,0 +1,333 @@
+from __future__ import annotations
+import json
+import multiprocessing as mp
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Protocol
+
+from common.histogram import LatencyHistogram
+
+DeliveryCallback = Callable[[Any, Any], None]
+Payload = tuple[bytes | None, bytes]
+# (index of the first record, count) -> the keyed payloads of those records
+PayloadSource = Callable[[int, int], list[Payload]]
+
+
+class ProducerSink(Protocol):
+    """The part of confluent_kafka.Producer the load generator uses."""
+
+    def produce(self, topic: str, value: bytes | None = None, key: bytes | None = None, on_delivery: DeliveryCallback | None = None) -> None: ...
+
+    def poll(self, timeout: float = ...) -> int: ...
+
+    def flush(self, timeout: float = ...) -> int: ...
+
+
+class KafkaSinkFactory:
+    """Builds a confluent_kafka Producer per load worker (picklable for processes)."""
+
+    def __init__(self, conf: dict[str, Any]):
+        self.conf = conf
+
+    def __call__(self) -> ProducerSink:
+        from confluent_kafka import Producer
+        return Producer(self.conf)
+
+
+class LocalMessage:
+    def __init__(self, topic: str, key: bytes | None, value: bytes | None):
+        self._topic = topic
+        self._key = key
+        self._value = value
+
+    def topic(self) -> str:
+        return self._topic
+
+    def key(self) -> bytes | None:
+        return self._key
+
+    def value(self) -> bytes | None:
+        return self._value
+
+    def partition(self) -> int:
+        return 0
+
+
+class LocalSink:
+    """In-process stand-in for a Producer: acks each record after `ack_latency`
+    seconds from poll()/flush(), failing every `fail_every`-th one if set."""
+
+    def __init__(self, ack_latency: float = 0.0, fail_every: int = 0):
+        self.ack_latency = ack_latency
+        self.fail_every = fail_every
+        self.produced = 0
+        self.bytes = 0
+        self._pending: list[tuple[float, DeliveryCallback | None, LocalMessage, Any]] = []
+        self._lock = threading.Lock()
+
+    def produce(self, topic: str, value: bytes | None = None, key: bytes | None = None, on_delivery: DeliveryCallback | None = None) -> None:
+        with self._lock:
+            self.produced += 1
+            self.bytes += len(value or b'')
+            err = 'simulated delivery failure' if self.fail_every and self.produced % self.fail_every == 0 else None
+            self._pending.append((time.perf_counter() + self.ack_latency, on_delivery, LocalMessage(topic, key, value), err))
+
+    def poll(self, timeout: float = 0) -> int:
+        # like Producer.poll: wait up to `timeout` for the next ack to fall due
+        with self._lock:
+            next_due = min((p[0] for p in self._pending), default=None)
+        if timeout > 0:
+            wait = timeout if next_due is None else min(timeout, next_due - time.perf_counter())
+            if wait > 0:
+                time.sleep(wait)
+        now = time.perf_counter()
+        with self._lock:
+            due = [p for p in self._pending if p[0] <= now]
+            self._pending = [p for p in self._pending if p[0] > now]
+        for _, cb, msg, err in due:
+            if cb is not None:
+                cb(err, msg)
+        return len(due)
+
+    def flush(self, timeout: float = -1) -> int:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                wait = self._pending[0][0] - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            self.poll(0)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+
+def local_sink_factory() -> ProducerSink:
+    return LocalSink()
+
+
+@dataclass
+class LoadConfig:
+    topic: str
+    num_records: int
+    threads: int = 1
+    processes: int = 1
+    # records per second across all workers, -1 for unthrottled
+    target_rate: float = -1
+    # distinct payloads rendered up front and cycled through; 0 renders per record
+    pregenerate: int = 1000
+    key_field: str | None = 'device_id'
+    # record -> value bytes, e.g. codec.Serializer; JSON when unset
+    serializer: Optional[Callable[[dict[Any, Any]], bytes]] = None
+    # e.g. batch_data.BatchPayloads; replaces the data generator, key_field
+    # and serializer when set
+    payloads: Optional[PayloadSource] = None
+
+
+@dataclass
+class LoadResult:
+    sent: int = 0
+    acked: int = 0
+    failed: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    errors: Counter[str] = field(default_factory=Counter)
+
+    def on_delivery(self, sent_at: float, lock: threading.Lock) -> DeliveryCallback:
+        def cb(err: Any, msg: Any) -> None:
+            latency = time.perf_counter() - sent_at
+            with lock:
+                if err is not None:
+                    self.failed += 1
+                    self.errors[str(err)] += 1
+                else:
+                    self.acked += 1
+                    self.latency.record(latency)
+        return cb
+
+    def merge(self, other: LoadResult) -> None:
+        self.sent += other.sent
+        self.acked += other.acked
+        self.failed += other.failed
+        self.bytes += other.bytes
+        self.elapsed = max(self.elapsed, other.elapsed)
+        self.latency.merge(other.latency)
+        self.errors.update(other.errors)
+
+    def to_dict(self) -> dict[str, Any]:
+        elapsed = self.elapsed or float('nan')
+        return {
+            'sent': self.sent,
+            'acked': self.acked,
+            'failed': self.failed,
+            'elapsed_s': self.elapsed,
+            'records_per_sec': self.acked / elapsed,
+            'mb_per_sec': self.bytes / elapsed / (1024 * 1024),
+            'avg_record_bytes': self.bytes / self.sent if self.sent else 0,
+            'latency_ms': self.latency.summary(),
+            'errors': dict(self.errors),
+        }
+
+    def report(self) -> str:
+        d = self.to_dict()
+        lat = d['latency_ms']
+        return (
+            f"{d['acked']} records acked ({d['failed']} failed), "
+            f"{d['records_per_sec']:.1f} records/sec ({d['mb_per_sec']:.2f} MB/sec), "
+            f"{lat['avg']:.2f} ms avg latency, {lat['max']:.2f} ms max latency, "
+            f"{lat['p50']:.2f} ms 50th, {lat['p95']:.2f} ms 95th, "
+            f"{lat['p99']:.2f} ms 99th, {lat['p999']:.2f} ms 99.9th."
+        )
+
+
+def render_record(
+    record: dict[Any, Any],
+    key_field: str | None,
+    serializer: Optional[Callable[[dict[Any, Any]], bytes]] = None,
+) -> Payload:
+    """Value bytes of a record (JSON unless a serializer is given), keyed by
+    `key_field` when the record has it."""
+    key = str(record[key_field]).encode('utf-8') if key_field and key_field in record else None
+    value = serializer(record) if serializer is not None else json.dumps(record).encode('utf-8')
+    return key, value
+
+
+class RecordPayloads:
+    """PayloadSource rendering `data_generator` records one at a time."""
+
+    def __init__(
+        self,
+        data_generator: Callable[[int], dict[Any, Any]],
+        key_field: str | None = 'device_id',
+        serializer: Optional[Callable[[dict[Any, Any]], bytes]] = None,
+    ):
+        self.data_generator = data_generator
+        self.key_field = key_field
+        self.serializer = serializer
+
+    def __call__(self, start: int, count: int) -> list[Payload]:
+        return [render_record(self.data_generator(start + i), self.key_field, self.serializer) for i in range(count)]
+
+
+def _run_worker(
+    config: LoadConfig,
+    sink_factory: Callable[[], ProducerSink],
+    data_generator: Callable[[int], dict[Any, Any]],
+    count: int,
+    rate: float,
+    offset: int,
+) -> LoadResult:
+    result = LoadResult()
+    producer = sink_factory()
+    source = config.payloads or RecordPayloads(data_generator, config.key_field, config.serializer)
+    payloads = source(offset, min(config.pregenerate, count)) if config.pregenerate else []
+    lock = threading.Lock()
+
+    start = time.perf_counter()
+    for i in range(count):
+        if rate > 0:
+            # open-loop pacing: record i is due at start + i / rate. Wait in
+            # poll() so delivery reports are served as they arrive instead of
+            # after the next send, which would add idle time to the latency.
+            due = start + i / rate
+            ahead = due - time.perf_counter()
+            while ahead > 0:
+                producer.poll(ahead)
+                ahead = due - time.perf_counter()
+        key, value = payloads[i % len(payloads)] if payloads else source(offset + i, 1)[0]
+        while True:
+            try:
+                producer.produce(config.topic, value=value, key=key, on_delivery=result.on_delivery(time.perf_counter(), lock))
+                break
+            except BufferError:
+                # local queue full: serve delivery reports and try again
+                producer.poll(0.05)
+        result.sent += 1
+        result.bytes += len(value)
+        producer.poll(0)
+    producer.flush()
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _run_process(
+    config: LoadConfig,
+    sink_factory: Callable[[], ProducerSink],
+    data_generator: Callable[[int], dict[Any, Any]],
+    counts: list[int],
+    rate: float,
+    offset: int,
+) -> LoadResult:
+    results: list[LoadResult] = [LoadResult() for _ in counts]
+    offsets = [offset + sum(counts[:i]) for i in range(len(counts))]
+
+    def target(idx: int) -> None:
+        results[idx] = _run_worker(config, sink_factory, data_generator, counts[idx], rate, offsets[idx])
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(len(counts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = LoadResult()
+    for r in results:
+        total.merge(r)
+    return total
+
+
+def _split(total: int, parts: int) -> list[int]:
+    return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+
+def run_load(
+    config: LoadConfig,
+    sink_factory: Callable[[], ProducerSink],
+    data_generator: Callable[[int], dict[Any, Any]],
+) -> LoadResult:
+    """Produces `config.num_records` records from `threads` x `processes` workers,
+    each with its own producer, and returns throughput and ack latencies."""
+    workers = max(1, config.threads) * max(1, config.processes)
+    rate = config.target_rate / workers if config.target_rate > 0 else -1
+    per_process = _split(config.num_records, max(1, config.processes))
+    per_thread = [_split(n, max(1, config.threads)) for n in per_process]
+    offsets = [sum(per_process[:i]) for i in range(len(per_process))]
+
+    start = time.perf_counter()
+    if config.processes <= 1:
+        total = _run_process(config, sink_factory, data_generator, per_thread[0], rate, 0)
+    else:
+        ctx = mp.get_context('fork' if os.name == 'posix' else 'spawn')
+        with ctx.Pool(config.processes) as pool:
+            parts = pool.starmap(
+                _run_process,
+                [(config, sink_factory, data_generator, per_thread[i], rate, offsets[i]) for i in range(config.processes)],
+            )
+        total = LoadResult()
+        for r in parts:
+            total.merge(r)
+    total.elapsed = time.perf_counter() - start
+    return total
+
+
+def producer_conf(
+    brokers: str,
+    batch_size: int = 16384,
+    linger_ms: int = 5,
+    compression: str = 'none',
+    acks: str = 'all',
+    extra: Optional[dict[str, Any]] = None,
+) -> dict[str, Any]:
+    conf: dict[str, Any] = {
+        'bootstrap.servers': brokers,
+        'acks': acks,
+        'batch.size': batch_size,
+        'linger.ms': linger_ms,
+        'compression.type': compression,
+    }
+    conf.update(extra or {})
+    return conf
@@ -1,7 +1,33 @@
 import argparse
+import json
 import sys
-from data import generate_record
+from pathlib import Path
+from typing import Any
+
+from batch_data import BatchPayloads
+from common.codec import Serializer
+from data import TELEMETRY_SCHEMA, TELEMETRY_SUBJECT, generate_record
+from experiments import Experiment, ExperimentRunner
 from kafka import KafkaClusterManager
+import segments
+
+
+def telemetry_serializer(kcm: KafkaClusterManager) -> Serializer:
+    return Serializer(kcm.schema_registry, TELEMETRY_SUBJECT, TELEMETRY_SCHEMA)
+
+
+def results_dir(args: argparse.Namespace) -> Path:
+    if args.results_dir:
+        return Path(args.results_dir)
+    return Path(args.workdir).expanduser().resolve() / 'results'
+
+
+def experiment_runner(kcm: KafkaClusterManager, args: argparse.Namespace) -> ExperimentRunner:
+    serializer = telemetry_serializer(kcm)
+    return ExperimentRunner(
+        kcm, results_dir(args), {'binary': serializer},
+        payloads={'json': BatchPayloads(), 'binary': BatchPayloads(serializer.schema_id)},
+    )
 
 
 def main():
@@ -19,9 +45,29 @@ def main():
     sub.add_parser('status', parents=[common], help='Show cluster status and endpoints')
     sub.add_parser('clean', parents=[common], help='Stop and clean (only auto-deletes if workdir in /tmp or /var)')
     sub.add_parser('stg1', parents=[common], help='Stage 1: topic creation')
-    sub.add_parser('stg2', parents=[common], help='Stage 2: testing performance with different batch sizes')
-    sub.add_parser('stg3', parents=[common], help='Stage 3: testing performance with different compression algorithms')
+    experiment = argparse.ArgumentParser(add_help=False)
+    experiment.add_argument('--records', type=int, default=500, help='Records produced per run')
+    experiment.add_argument('--repetitions', type=int, default=3, help='Measured runs per matrix cell')
+    experiment.add_argument('--warmup', type=int, default=1, help='Discarded runs per matrix cell')
+    experiment.add_argument('--results-dir', help='Where JSON/CSV results go (default: <workdir>/results)')
+
+    sub.add_parser('stg2', parents=[common, experiment], help='Stage 2: testing performance with different batch sizes')
+    sub.add_parser('stg3', parents=[common, experiment], help='Stage 3: testing performance with different compression algorithms')
     sub.add_parser('stg4', parents=[common], help='Stage 4: testing partitioning')
+    seg = sub.add_parser('segments', parents=[common], help='Analyze on-disk log segments (no running broker needed)')
+    seg.add_argument('--topic', action='append', help='Only these topics (repeatable)')
+    stg5 = sub.add_parser('stg5', parents=[common], help='Stage 5: consumer group throughput and lag')
+    stg5.add_argument('--partitions', type=int, nargs='+', default=[3, 6], help='Partition counts to test')
+    stg5.add_argument('--max-members', type=int, help='Largest consumer group (default: partition count)')
+    stg5.add_argument('--backlog', type=int, default=20_000, help='Records pre-filled before each group starts')
+    stg5.add_argument('--live-records', type=int, default=2_000, help='Records produced while the group runs')
+    stg5.add_argument('--live-rate', type=float, default=1_000, help='Live records per second')
+    stg5.add_argument('--results-dir', help='Where JSON results go (default: <workdir>/results)')
+    matrix = sub.add_parser('experiment', parents=[common, experiment], help='Run a custom producer parameter matrix')
+    matrix.add_argument('--name', default='nuclear-matrix', help='Experiment name, used for topics and result files')
+    matrix.add_argument('--matrix', required=True,
+                        help='JSON object of parameter -> values, e.g. \'{"batch_size": [16384, 65536], "compression": ["none", "lz4"]}\'; '
+                             'parameters: batch_size, linger_ms, compression, partitions, replication, record_size (json only), format (json|binary)')
 
     args = parser.parse_args()
     if not args.cmd:
@@ -63,6 +109,7 @@ def main():
                 topic=topic,
                 data_generator=generate_record,
                 num_messages=500,
+                payloads=BatchPayloads(),
             )
             kcm.stop()
             kcm.clean()
@@ -71,42 +118,93 @@ def main():
     elif args.cmd == 'stg2':
         kcm.init()
         if kcm.start():
-            topic = 'nuclear-batch-test'
-            kcm.create_topic(topic=topic, partitions=3, replication=3)
-            kcm.describe_topic(topic=topic)
+            runner = experiment_runner(kcm, args)
+            runner.run(Experiment(
+                name='nuclear-batch-test',
+                matrix={
+                    'batch_size': [16_384, 65_536, 262_144],
+                    'linger_ms': [0, 10, 50],
+                    'partitions': [3],
+                    'replication': [3],
+                },
+                num_records=args.records,
+                repetitions=args.repetitions,
+                warmup=args.warmup,
+            ), generate_record)
+            kcm.stop()
+            kcm.clean()
 
-            batch_sizes = [16_384, 65_536, 262_144]
-            linger_ms_values = [0, 10, 50]
+    elif args.cmd == 'stg3':
+        kcm.init()
+        if kcm.start():
+            runner = experiment_runner(kcm, args)
+            summary = runner.run(Experiment(
+                name='nuclear-comp',
+                matrix={
+                    'compression': ["none", "snappy", "lz4", "zstd"],
+                    'format': ["json", "binary"],
+                },
+                num_records=args.records,
+                repetitions=args.repetitions,
+                warmup=args.warmup,
+            ), generate_record)
+            print(segments.report(kcm.analyze_segments([f"nuclear-comp-{row['cell']}" for row in summary])))
+            kcm.stop()
+            kcm.clean()
 
-            for batch_size in batch_sizes:
-                for linger_ms in linger_ms_values:
-                    print(f"\n=== Testing batch_size={batch_size}, linger_ms={linger_ms} ===\n")
-                    kcm.producer_perf_test(
+    elif args.cmd == 'stg5':
+        kcm.init()
+        if kcm.start():
+            topics = {p: f"nuclear-consume-{p}" for p in args.partitions}
+            kcm.create_topics([(t, p, 3) for p, t in topics.items()])
+            runs: list[dict[str, Any]] = []
+            for partitions, topic in topics.items():
+                kcm.send_messages(
+                    producer=None,
+                    topic=topic,
+                    data_generator=generate_record,
+                    num_messages=args.backlog,
+                    flush_every=args.backlog,
+                    processes=min(4, partitions),
+                    payloads=BatchPayloads(),
+                )
+                backlog = sum(kcm.topic_message_counts(topic=topic))
+                for members in range(1, (args.max_members or partitions) + 1):
+                    print(f"\n=== Testing partitions={partitions}, members={members} ===\n")
+                    # every group starts from the earliest offset, so the
+                    # topic grows by the live records of each earlier run
+                    result = kcm.consumer_group_test(
                         topic=topic,
-                        num_records=500,
-                        record_size=256,
-                        batch_size=batch_size,
-                        linger_ms=linger_ms
+                        members=members,
+                        target=backlog,
+                        live_records=args.live_records,
+                        live_rate=args.live_rate,
+                        data_generator=generate_record,
                     )
+                    backlog += args.live_records
+                    runs.append({'partitions': partitions, **result.to_dict()})
+            out = results_dir(args)
+            out.mkdir(parents=True, exist_ok=True)
+            (out / 'stg5.json').write_text(json.dumps(runs, indent=2))
+            print(f"Results written to {out / 'stg5.json'}")
             kcm.stop()
             kcm.clean()
 
-    elif args.cmd == 'stg3':
+    elif args.cmd == 'segments':
+        replicas = kcm.analyze_segments(args.topic)
+        print(segments.report(replicas))
+
+    elif args.cmd == 'experiment':
         kcm.init()
         if kcm.start():
-            compression_algorithms = ["none", "snappy", "lz4", "zstd"]
-            for algo in compression_algorithms:
-                print(f"\n=== Testing compression={algo} ===\n")
-                topic = f"nuclear-comp-{algo}"
-                kcm.create_topic(topic=topic, partitions=1, replication=1)
-                kcm.producer_perf_test(
-                    topic=topic,
-                    num_records=500,
-                    record_size=256,
-                    compression=algo,
-                )
-                size_kb = kcm.topic_partition_size(topic=topic, partition=0) / 1024
-                print(f"Topic '{topic}' size: {size_kb:.2f} KB\n")
+            runner = experiment_runner(kcm, args)
+            runner.run(Experiment(
+                name=args.name,
+                matrix=json.loads(args.matrix),
+                num_records=args.records,
+                repetitions=args.repetitions,
+                warmup=args.warmup,
+            ), generate_record)
             kcm.stop()
             kcm.clean()
 
@@ -114,11 +212,11 @@ def main():
         kcm.init()
         if kcm.start():
             topic_partitions = [3, 6, 9]
+            kcm.create_topics([(f"nuclear-part-{p}", p, 3) for p in topic_partitions])
+            kcm.describe_topics([f"nuclear-part-{p}" for p in topic_partitions])
             for partiotions in topic_partitions:
                 print(f"\n=== Testing partioning={partiotions} ===\n")
                 topic = f"nuclear-part-{partiotions}"
-                kcm.create_topic(topic=topic, partitions=partiotions, replication=3)
-                kcm.describe_topic(topic=topic)
                 producer = kcm.create_producer()
                 kcm.send_messages(
                     producer=producer,
@@ -126,8 +224,9 @@ def main():
                     data_generator=generate_record,
                     num_messages=500,
                     flush_every=100,
+                    payloads=BatchPayloads(),
                 )
-                counts = [kcm.topic_partition_messages(topic=topic, partition=i) for i in range(partiotions) ]
+                counts = kcm.topic_message_counts(topic=topic)
                 print(f"Topic '{topic}' partition message counts: {counts}\n")
             kcm.stop()
             kcm.clean()
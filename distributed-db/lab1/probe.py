@@ -0,0 +1,41 @@
+from __future__ import annotations
+import socket
+import time
+from typing import Iterable
+
+Address = tuple[str, int]
+
+
+def parse_address(endpoint: str) -> Address:
+    host, port = endpoint.rsplit(':', 1)
+    return host, int(port)
+
+
+def port_open(address: Address, timeout: float = 0.5) -> bool:
+    try:
+        with socket.create_connection(address, timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def wait_for_ports(
+    addresses: Iterable[Address],
+    timeout: float = 30,
+    initial_delay: float = 0.05,
+    max_delay: float = 1.0,
+) -> list[Address]:
+    """Probes until every address accepts a TCP connection, backing off
+    exponentially between rounds. Returns the addresses still closed at the
+    deadline, so an empty list means all are ready."""
+    pending = list(addresses)
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while pending:
+        pending = [a for a in pending if not port_open(a, timeout=min(0.5, max(0.01, deadline - time.monotonic())))]
+        remaining = deadline - time.monotonic()
+        if not pending or remaining <= 0:
+            break
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
+    return pending
@@ -1,7 +1,11 @@
 from __future__ import annotations
+import queue
 import subprocess
 import shlex
+import time
+import traceback
 from pathlib import Path
+from typing import Any, Callable
 
 def run(
     cmd: str | list[str] | tuple[str, ...],
@@ -64,3 +68,41 @@ def run(
             return p.returncode, '', ''
     except subprocess.TimeoutExpired:
         raise
+
+
+def report_result(results: Any, index: int, fn: Callable[..., Any], *args: Any) -> None:
+    """Child-process side of gather(): runs fn(*args) and puts
+    (index, value, None) on `results`, or (index, None, traceback) if it raised."""
+    try:
+        value = fn(*args)
+    except BaseException:
+        results.put((index, None, traceback.format_exc()))
+        return
+    results.put((index, value, None))
+
+
+def gather(results: Any, procs: list[Any], poll: float = 0.5) -> list[Any]:
+    """Collects the report_result() value of every process in `procs`, in order.
+
+    Raises RuntimeError with the child's traceback as soon as one fails, or
+    with its exit code when it died without reporting (killed, out of memory),
+    instead of waiting forever for a result that will never come.
+    """
+    out: dict[int, Any] = {}
+    gone_since: dict[int, float] = {}
+    while len(out) < len(procs):
+        try:
+            index, value, error = results.get(timeout=poll)
+        except queue.Empty:
+            now = time.monotonic()
+            for i, p in enumerate(procs):
+                if i in out or p.is_alive():
+                    continue
+                # a result put just before exiting may still be in the pipe
+                if now - gone_since.setdefault(i, now) > poll:
+                    raise RuntimeError(f"child process {i} exited with code {p.exitcode} without a result")
+            continue
+        if error is not None:
+            raise RuntimeError(f"child process {index} failed:\n{error}")
+        out[index] = value
+    return [out[i] for i in range(len(procs))]
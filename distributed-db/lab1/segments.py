@@ -0,0 +1,249 @@
+from __future__ import annotations
+import argparse
+import gzip
+import json
+import re
+import struct
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+# Record batch v2 header, everything before the records:
+# baseOffset, batchLength, partitionLeaderEpoch, magic, crc, attributes,
+# lastOffsetDelta, baseTimestamp, maxTimestamp, producerId, producerEpoch,
+# baseSequence, recordsCount
+_BATCH = struct.Struct('>qiibIhiqqqhii')
+# baseOffset and batchLength are not counted in batchLength
+_LOG_OVERHEAD = 12
+
+CODECS = {0: 'none', 1: 'gzip', 2: 'snappy', 3: 'lz4', 4: 'zstd'}
+_CONTROL = 0x20
+
+_BROKER_DIR = re.compile(r'kraft-combined-logs-(\d+)$')
+_PARTITION_DIR = re.compile(r'(.+)-(\d+)$')
+
+
+@dataclass
+class BatchHeader:
+    base_offset: int
+    length: int
+    magic: int
+    attributes: int
+    last_offset_delta: int
+    base_timestamp: int
+    max_timestamp: int
+    records: int
+    # the records section, compressed when the codec is not none
+    payload: bytes
+
+    @property
+    def codec(self) -> str:
+        return CODECS.get(self.attributes & 0x07, 'unknown')
+
+    @property
+    def control(self) -> bool:
+        return bool(self.attributes & _CONTROL)
+
+    @property
+    def size(self) -> int:
+        return _LOG_OVERHEAD + self.length
+
+
+def read_batches(path: Path) -> Iterator[BatchHeader]:
+    """Record batches of one segment file; stops at a truncated tail."""
+    data = path.read_bytes()
+    pos = 0
+    while pos + _BATCH.size <= len(data):
+        (base_offset, length, _, magic, _, attributes, last_delta,
+         base_ts, max_ts, _, _, _, records) = _BATCH.unpack_from(data, pos)
+        end = pos + _LOG_OVERHEAD + length
+        if length <= 0 or end > len(data):
+            break
+        if magic != 2:
+            raise ValueError(f'{path}: unsupported record batch magic {magic} at byte {pos}')
+        yield BatchHeader(
+            base_offset, length, magic, attributes, last_delta,
+            base_ts, max_ts, records, data[pos + _BATCH.size:end],
+        )
+        pos = end
+
+
+def _snappy(data: bytes) -> bytes:
+    import snappy  # type: ignore[import-not-found]
+    # the Java client writes snappy in xerial framing: magic, two ints, then
+    # length-prefixed blocks
+    if data[:8] != b'\x82SNAPPY\x00':
+        return snappy.decompress(data)
+    out: list[bytes] = []
+    pos = 16
+    while pos < len(data):
+        (n,) = struct.unpack_from('>i', data, pos)
+        out.append(snappy.decompress(data[pos + 4:pos + 4 + n]))
+        pos += 4 + n
+    return b''.join(out)
+
+
+def _lz4(data: bytes) -> bytes:
+    import lz4.frame  # type: ignore[import-not-found]
+    return lz4.frame.decompress(data)
+
+
+def _zstd(data: bytes) -> bytes:
+    import zstandard  # type: ignore[import-not-found]
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+_DECOMPRESS: dict[str, Callable[[bytes], bytes]] = {
+    'gzip': gzip.decompress,
+    'snappy': _snappy,
+    'lz4': _lz4,
+    'zstd': _zstd,
+}
+
+
+def uncompressed_size(batch: BatchHeader) -> Optional[int]:
+    """Size of the records section once decompressed, or None when the codec's
+    Python package (python-snappy, lz4, zstandard) is not installed."""
+    if batch.codec == 'none':
+        return len(batch.payload)
+    decompress = _DECOMPRESS.get(batch.codec)
+    if decompress is None:
+        return None
+    try:
+        return len(decompress(batch.payload))
+    except ImportError:
+        return None
+
+
+@dataclass
+class ReplicaStats:
+    broker: int
+    topic: str
+    partition: int
+    segments: int = 0
+    batches: int = 0
+    control_batches: int = 0
+    records: int = 0
+    disk_bytes: int = 0
+    compressed_bytes: int = 0
+    # None once any batch could not be decompressed
+    uncompressed_bytes: Optional[int] = 0
+    first_offset: Optional[int] = None
+    last_offset: Optional[int] = None
+    codecs: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def records_per_batch(self) -> float:
+        data_batches = self.batches - self.control_batches
+        return self.records / data_batches if data_batches else 0.0
+
+    @property
+    def compression_ratio(self) -> Optional[float]:
+        if not self.uncompressed_bytes or not self.compressed_bytes:
+            return None
+        return self.uncompressed_bytes / self.compressed_bytes
+
+    def add(self, batch: BatchHeader) -> None:
+        self.batches += 1
+        self.disk_bytes += batch.size
+        self.codecs[batch.codec] += 1
+        if self.first_offset is None:
+            self.first_offset = batch.base_offset
+        self.last_offset = batch.base_offset + batch.last_offset_delta
+        if batch.control:
+            self.control_batches += 1
+            return
+        self.records += batch.records
+        self.compressed_bytes += len(batch.payload)
+        size = uncompressed_size(batch)
+        if size is None or self.uncompressed_bytes is None:
+            self.uncompressed_bytes = None
+        else:
+            self.uncompressed_bytes += size
+
+    def to_dict(self) -> dict[str, Any]:
+        d = asdict(self)
+        d['codecs'] = dict(self.codecs)
+        d['records_per_batch'] = self.records_per_batch
+        d['compression_ratio'] = self.compression_ratio
+        return d
+
+
+def scan(data_dir: Path, topics: Optional[list[str]] = None) -> list[ReplicaStats]:
+    """Stats of every partition replica under `data_dir`/kraft-combined-logs-N."""
+    replicas: list[ReplicaStats] = []
+    for broker_dir in sorted(data_dir.iterdir()):
+        broker = _BROKER_DIR.search(broker_dir.name)
+        if broker is None or not broker_dir.is_dir():
+            continue
+        for partition_dir in sorted(broker_dir.iterdir()):
+            m = _PARTITION_DIR.match(partition_dir.name)
+            if m is None or not partition_dir.is_dir():
+                continue
+            topic, partition = m.group(1), int(m.group(2))
+            if topics is not None and topic not in topics:
+                continue
+            stats = ReplicaStats(int(broker.group(1)), topic, partition)
+            for segment in sorted(partition_dir.glob('*.log')):
+                stats.segments += 1
+                for batch in read_batches(segment):
+                    stats.add(batch)
+            replicas.append(stats)
+    return replicas
+
+
+def consistency(replicas: list[ReplicaStats]) -> dict[tuple[str, int], list[str]]:
+    """Differences between the replicas of each partition, keyed by (topic, partition)."""
+    by_partition: dict[tuple[str, int], list[ReplicaStats]] = {}
+    for r in replicas:
+        by_partition.setdefault((r.topic, r.partition), []).append(r)
+    problems: dict[tuple[str, int], list[str]] = {}
+    for key, group in sorted(by_partition.items()):
+        issues: list[str] = []
+        for attr in ('last_offset', 'records', 'batches', 'disk_bytes'):
+            values = {r.broker: getattr(r, attr) for r in group}
+            if len(set(values.values())) > 1:
+                issues.append(f'{attr} differs: ' + ', '.join(f'broker {b}={v}' for b, v in sorted(values.items())))
+        problems[key] = issues
+    return problems
+
+
+def report(replicas: list[ReplicaStats]) -> str:
+    lines = [
+        f"{'topic':<28} {'part':>4} {'broker':>6} {'batches':>8} {'records':>8} {'rec/batch':>9} "
+        f"{'disk KB':>9} {'raw KB':>9} {'ratio':>6}  codecs"
+    ]
+    for r in sorted(replicas, key=lambda r: (r.topic, r.partition, r.broker)):
+        raw = f'{r.uncompressed_bytes / 1024:9.1f}' if r.uncompressed_bytes is not None else f"{'n/a':>9}"
+        ratio = f'{r.compression_ratio:6.2f}' if r.compression_ratio is not None else f"{'n/a':>6}"
+        codecs = ','.join(f'{c}x{n}' for c, n in sorted(r.codecs.items()))
+        lines.append(
+            f'{r.topic:<28} {r.partition:>4} {r.broker:>6} {r.batches:>8} {r.records:>8} '
+            f'{r.records_per_batch:>9.1f} {r.disk_bytes / 1024:9.1f} {raw} {ratio}  {codecs}'
+        )
+    for (topic, partition), issues in consistency(replicas).items():
+        for issue in issues:
+            lines.append(f'! {topic}-{partition}: {issue}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze Kafka log segments offline')
+    parser.add_argument('data_dir', help='Directory holding kraft-combined-logs-N')
+    parser.add_argument('--topic', action='append', help='Only these topics (repeatable)')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args()
+
+    replicas = scan(Path(args.data_dir), args.topic)
+    if args.json:
+        print(json.dumps({
+            'replicas': [r.to_dict() for r in replicas],
+            'consistency': {f'{t}-{p}': issues for (t, p), issues in consistency(replicas).items()},
+        }, indent=2))
+    else:
+        print(report(replicas))
+
+
+if __name__ == '__main__':
+    main()
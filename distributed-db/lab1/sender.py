@@ -0,0 +1,170 @@
+from __future__ import annotations
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Callable, Iterable, Iterator
+
+from loadgen import LoadResult, Payload, PayloadSource, ProducerSink, RecordPayloads
+from run_utils import gather, report_result
+
+# seconds between liveness checks of the sender processes while blocked on them
+_POLL = 0.5
+
+
+def _produce_all(producer: ProducerSink, topic: str, chunks: Iterable[list[Payload]]) -> LoadResult:
+    result = LoadResult()
+    lock = threading.Lock()
+    start = time.perf_counter()
+    for chunk in chunks:
+        for key, value in chunk:
+            while True:
+                try:
+                    producer.produce(topic, value=value, key=key, on_delivery=result.on_delivery(time.perf_counter(), lock))
+                    break
+                except BufferError:
+                    # local queue full: serve delivery reports and try again
+                    producer.poll(0.05)
+            result.sent += 1
+            result.bytes += len(value)
+        producer.poll(0)
+    producer.flush()
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _drain(inbox: Any) -> Iterator[list[Payload]]:
+    while True:
+        chunk = inbox.get()
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _sender_process(index: int, sink_factory: Callable[[], ProducerSink], topic: str, inbox: Any, results: Any) -> None:
+    report_result(results, index, lambda: _produce_all(sink_factory(), topic, _drain(inbox)))
+
+
+def _progress(first: int, count: int, total: int, every: int) -> None:
+    done = first + count
+    if every and done // every > first // every:
+        print(f"{done}/{total} messages queued.")
+
+
+def route(key: bytes | None, index: int, processes: int) -> int:
+    """Sender process for a record; all records with the same key go to one process."""
+    if key is None:
+        return index % processes
+    return zlib.crc32(key) % processes
+
+
+class ParallelSender:
+    """
+    Renders records in the calling process and fans them out to `processes`
+    sender processes, each with its own producer. Records are routed by key,
+    so every key is produced by one process in generation order. If a sender
+    process fails or dies, send() raises its error instead of blocking on it.
+    """
+
+    def __init__(
+        self,
+        sink_factory: Callable[[], ProducerSink],
+        processes: int = 2,
+        chunk_size: int = 500,
+        queue_chunks: int = 8,
+    ):
+        self.sink_factory = sink_factory
+        self.processes = max(1, processes)
+        self.chunk_size = chunk_size
+        self.queue_chunks = queue_chunks
+
+    def send(
+        self,
+        topic: str,
+        data_generator: Callable[[int], dict[Any, Any]],
+        num_messages: int,
+        key_field: str | None = 'device_id',
+        progress_every: int = 0,
+        serializer: Callable[[dict[Any, Any]], bytes] | None = None,
+        payloads: PayloadSource | None = None,
+    ) -> LoadResult:
+        """Sends `num_messages` records drawn `chunk_size` at a time from
+        `payloads`, or rendered from `data_generator` when it is unset."""
+        source = payloads or RecordPayloads(data_generator, key_field, serializer)
+        ctx = mp.get_context('fork' if os.name == 'posix' else 'spawn')
+        inboxes = [ctx.Queue(self.queue_chunks) for _ in range(self.processes)]
+        results = ctx.Queue()
+        workers = [
+            ctx.Process(target=_sender_process, args=(i, self.sink_factory, topic, inbox, results), daemon=True)
+            for i, inbox in enumerate(inboxes)
+        ]
+        for w in workers:
+            w.start()
+
+        def put(target: int, item: list[Payload] | None) -> None:
+            while True:
+                try:
+                    inboxes[target].put(item, timeout=_POLL)
+                    return
+                except queue.Full:
+                    if not workers[target].is_alive():
+                        # raises the sender's traceback or exit code
+                        gather(results, workers, _POLL)
+                        raise RuntimeError(f"sender process {target} exited with code {workers[target].exitcode}")
+
+        start = time.perf_counter()
+        total = LoadResult()
+        try:
+            buffers: list[list[Payload]] = [[] for _ in range(self.processes)]
+            for first in range(0, num_messages, self.chunk_size):
+                chunk = source(first, min(self.chunk_size, num_messages - first))
+                for i, (key, value) in enumerate(chunk, first):
+                    target = route(key, i, self.processes)
+                    buffers[target].append((key, value))
+                    if len(buffers[target]) >= self.chunk_size:
+                        put(target, buffers[target])
+                        buffers[target] = []
+                _progress(first, len(chunk), num_messages, progress_every)
+            for target, buffer in enumerate(buffers):
+                if buffer:
+                    put(target, buffer)
+                put(target, None)
+
+            for r in gather(results, workers, _POLL):
+                total.merge(r)
+        except BaseException:
+            for w in workers:
+                w.terminate()
+            # chunks still buffered for a dead sender would block interpreter exit
+            for inbox in inboxes:
+                inbox.cancel_join_thread()
+            raise
+        finally:
+            for w in workers:
+                w.join()
+        total.elapsed = time.perf_counter() - start
+        return total
+
+
+def send_serial(
+    producer: ProducerSink,
+    topic: str,
+    data_generator: Callable[[int], dict[Any, Any]],
+    num_messages: int,
+    key_field: str | None = 'device_id',
+    chunk_size: int = 500,
+    progress_every: int = 0,
+    serializer: Callable[[dict[Any, Any]], bytes] | None = None,
+    payloads: PayloadSource | None = None,
+) -> LoadResult:
+    source = payloads or RecordPayloads(data_generator, key_field, serializer)
+
+    def chunks() -> Iterator[list[Payload]]:
+        for first in range(0, num_messages, chunk_size):
+            chunk = source(first, min(chunk_size, num_messages - first))
+            _progress(first, len(chunk), num_messages, progress_every)
+            yield chunk
+
+    return _produce_all(producer, topic, chunks())
@@ -1,7 +1,9 @@
 import random
 from datetime import datetime, timedelta, date, timezone
 from cassandra.cluster import Cluster
-from cassandra.query import SimpleStatement, BatchStatement
+from cassandra.query import BatchStatement
+
+from common.statements import statements
 
 CASSANDRA_CONTACT_POINTS = ['localhost']
 KEYSPACE = 'npp_ukraine'
@@ -81,25 +83,28 @@ CREATE TABLE IF NOT EXISTS analytics_by_reactor_type (
 
 print("Tables created/verified.\n")
 
-insert_reactor = session.prepare('''
+# every statement below is prepared once and reused from here
+registry = statements(session)
+
+insert_reactor = registry.prepare('''
 INSERT INTO reactor_readings (reactor_id, reading_time, core_temp, primary_pressure, power_mw, radiation_msv, sensor_status)
 VALUES (?, ?, ?, ?, ?, ?, ?)
-''')
+''', idempotent=True)
 
-insert_cooling = session.prepare('''
+insert_cooling = registry.prepare('''
 INSERT INTO cooling_system (reactor_id, reading_time, pump_id, flow_rate_m3s, inlet_temp_c, outlet_temp_c, pump_status)
 VALUES (?, ?, ?, ?, ?, ?, ?)
-''')
+''', idempotent=True)
 
-insert_daily = session.prepare('''
+insert_daily = registry.prepare('''
 INSERT INTO daily_safety_summary (station_name, summary_date, reactor_id, max_core_temp, max_pressure, avg_radiation, safety_events_count, notes)
 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-''')
+''', idempotent=True)
 
-insert_analytics = session.prepare('''
+insert_analytics = registry.prepare('''
 INSERT INTO analytics_by_reactor_type (reactor_type, period_start, period_end, avg_power_mw, max_radiation, avg_core_temp, num_readings)
 VALUES (?, ?, ?, ?, ?, ?, ?)
-''')
+''', idempotent=True)
 
 def generate_reactor_reading(base_temp=290.0):
     """Simulate a reactor sensor reading."""
@@ -173,14 +178,15 @@ print("--- Basic Analysis ---")
 
 for reactor in REACTORS:
     reactor_id = reactor['reactor_id']
-    stmt = SimpleStatement("SELECT count(*) FROM reactor_readings WHERE reactor_id = %s")
-    row = session.execute(stmt, (reactor_id,)).one()
+    row = registry.execute("SELECT count(*) FROM reactor_readings WHERE reactor_id = ?", (reactor_id,),
+                           idempotent=True).one()
     print(f"Reactor {reactor_id}: {row.count} readings")
 
 total_power = 0
 count = 0
 for reactor in REACTORS:
-    rows = session.execute("SELECT power_mw FROM reactor_readings WHERE reactor_id = %s LIMIT 100", (reactor['reactor_id'],))
+    rows = registry.execute("SELECT power_mw FROM reactor_readings WHERE reactor_id = ? LIMIT 100", (reactor['reactor_id'],),
+                            idempotent=True)
     for r in rows:
         total_power += r.power_mw
         count += 1
@@ -191,14 +197,18 @@ print(f"\nAverage power across reactors (sample of 100 each): {avg_power} MW")
 print("\nLatest readings per reactor:")
 for reactor in REACTORS:
     reactor_id = reactor['reactor_id']
-    latest = session.execute(
+    latest = registry.execute(
         "SELECT reading_time, core_temp, primary_pressure, power_mw, radiation_msv "
-        "FROM reactor_readings WHERE reactor_id = %s LIMIT 1",
-        (reactor_id,)
+        "FROM reactor_readings WHERE reactor_id = ? LIMIT 1",
+        (reactor_id,),
+        idempotent=True
     ).one()
     if latest:
         print(f"  {reactor_id} @ {latest.reading_time}: {latest.power_mw} MW, "
               f"{latest.core_temp} °C, {latest.radiation_msv} mSv")
 
+stats = registry.stats()
+print(f"\nPrepared statements: {stats['statements']}, cache hits: {stats['hits']}")
+
 print("\nAnalysis complete. Program finished successfully.")
 cluster.shutdown()
@@ -1,128 +1,163 @@
 import argparse
+import json
+import sys
 import time
-import numpy as np
 import datetime as dt
+from collections import namedtuple
 from cassandra.cluster import Cluster
 from tqdm import tqdm
 
+from common.statements import statements
+from loadtest import closed_loop, open_loop
+
 REACTORS = ['reactor-1', 'reactor-2', 'reactor-3', 'reactor-4']
 
+# the driver's default page size
+DEFAULT_FETCH_SIZE = 5000
+
+QUERIES = {
+    'latest': lambda session, schema, device, fs: q_latest(session, schema, device, fs),
+    'range6': lambda session, schema, device, fs: q_time_range(session, schema, device, hours=6, fetch_size=fs),
+    'daily': lambda session, schema, device, fs: q_daily_agg(session, schema, device, fs),
+    'filtered_af': lambda session, schema, device, fs: q_filtered(session, schema, device, method='allow_filtering', fetch_size=fs),
+    'filtered_mv': lambda session, schema, device, fs: q_filtered(session, schema, device, method='mv', fetch_size=fs),
+}
 
-def percentiles(latencies_ms):
-    return {
-        'avg': float(sum(latencies_ms)/len(latencies_ms)),
-        'p50': float(np.percentile(latencies_ms, 50)),
-        'p95': float(np.percentile(latencies_ms, 95)),
-        'p99': float(np.percentile(latencies_ms, 99))
-    }
+# seconds until the first page arrived and until the last row was read
+Fetch = namedtuple('Fetch', ['first_row', 'last_row', 'pages', 'rows'])
 
 
-def q_latest(session, schema, device_id):
+def fetch_all(session, cql, params, fetch_size=DEFAULT_FETCH_SIZE, on_rows=None):
+    """
+    Runs the query as a prepared statement and reads every page, passing each
+    page's rows to `on_rows`. Preparing happens once per session, outside the
+    timed section.
+    """
+    bound = statements(session).bind(cql, params, fetch_size, idempotent=True)
+    start = time.perf_counter()
+    rs = session.execute(bound)
+    first_row = time.perf_counter() - start
+    pages, rows = 1, 0
+    while True:
+        page = rs.current_rows
+        rows += len(page)
+        if on_rows is not None:
+            on_rows(page)
+        if not rs.has_more_pages:
+            break
+        rs.fetch_next_page()
+        pages += 1
+    return Fetch(first_row, time.perf_counter() - start, pages, rows)
+
+
+def q_latest(session, schema, device_id, fetch_size=DEFAULT_FETCH_SIZE):
     if schema == 'simple':
-        cql = "SELECT * FROM telemetry_simple WHERE device_id = %s LIMIT 100"
+        cql = "SELECT * FROM telemetry_simple WHERE device_id = ? LIMIT 100"
         params = (device_id,)
     elif schema == 'hourly':
         now = dt.datetime.now(dt.timezone.utc)
         bh = int(now.replace(minute=0, second=0, microsecond=0).timestamp() // 3600)
-        cql = "SELECT * FROM telemetry_hourly WHERE device_id=%s AND bucket_hour=%s LIMIT 100"
+        cql = "SELECT * FROM telemetry_hourly WHERE device_id=? AND bucket_hour=? LIMIT 100"
         params = (device_id, bh)
     else:
         now = dt.date.today()
-        cql = "SELECT * FROM telemetry_daily WHERE device_id=%s AND bucket_date=%s LIMIT 100"
+        cql = "SELECT * FROM telemetry_daily WHERE device_id=? AND bucket_date=? LIMIT 100"
         params = (device_id, now)
-    start = time.perf_counter()
-    rows = session.execute(cql, params)
-    elapsed = (time.perf_counter() - start) * 1000.0
-    _ = list(rows)
-    return elapsed
+    return fetch_all(session, cql, params, fetch_size)
 
 
-def q_time_range(session, schema, device_id, hours=6):
+def q_time_range(session, schema, device_id, hours=6, fetch_size=DEFAULT_FETCH_SIZE):
     end = dt.datetime.now(dt.timezone.utc)
     start_ts = end - dt.timedelta(hours=hours)
     if schema == 'simple':
-        cql = "SELECT * FROM telemetry_simple WHERE device_id=%s AND ts >= %s AND ts <= %s"
+        cql = "SELECT * FROM telemetry_simple WHERE device_id=? AND ts >= ? AND ts <= ?"
         params = (device_id, start_ts, end)
     elif schema == 'hourly':
         b_end = int(end.replace(minute=0, second=0, microsecond=0).timestamp() // 3600)
-        cql = "SELECT * FROM telemetry_hourly WHERE device_id=%s AND bucket_hour=%s AND ts >= %s AND ts <= %s"
+        cql = "SELECT * FROM telemetry_hourly WHERE device_id=? AND bucket_hour=? AND ts >= ? AND ts <= ?"
         params = (device_id, b_end, start_ts, end)
     else:
         bday = end.date()
-        cql = "SELECT * FROM telemetry_daily WHERE device_id=%s AND bucket_date=%s AND ts >= %s AND ts <= %s"
+        cql = "SELECT * FROM telemetry_daily WHERE device_id=? AND bucket_date=? AND ts >= ? AND ts <= ?"
         params = (device_id, bday, start_ts, end)
-    start = time.perf_counter()
-    rows = session.execute(cql, params)
-    elapsed = (time.perf_counter() - start) * 1000.0
-    _ = list(rows)
-    return elapsed
+    return fetch_all(session, cql, params, fetch_size)
 
 
-def q_daily_agg(session, schema, device_id):
+def q_daily_agg(session, schema, device_id, fetch_size=DEFAULT_FETCH_SIZE):
     if schema == 'daily':
-        cql = "SELECT count, avg, min, max FROM telemetry_daily_agg WHERE device_id=%s AND bucket_date=%s"
+        cql = "SELECT count, avg, min, max FROM telemetry_daily_agg WHERE device_id=? AND bucket_date=?"
         params = (device_id, dt.date.today())
     else:
         if schema == 'hourly':
-            cql = "SELECT power_output FROM telemetry_hourly WHERE device_id=%s AND bucket_hour=%s"
+            cql = "SELECT power_output FROM telemetry_hourly WHERE device_id=? AND bucket_hour=?"
             bh = int(dt.datetime.now(dt.timezone.utc).replace(minute=0, second=0, microsecond=0).timestamp() // 3600)
             params = (device_id, bh)
         else:
-            cql = "SELECT power_output FROM telemetry_simple WHERE device_id=%s"
+            cql = "SELECT power_output FROM telemetry_simple WHERE device_id=?"
             params = (device_id,)
-    start = time.perf_counter()
-    rows = session.execute(cql, params)
-    vals = [r.power_output for r in rows if getattr(r,'power_output',None) is not None]
-    elapsed = (time.perf_counter() - start) * 1000.0
+    vals = []
+    fetch = fetch_all(session, cql, params, fetch_size,
+                      on_rows=lambda rows: vals.extend(r.power_output for r in rows if getattr(r,'power_output',None) is not None))
     if vals:
         _ = (len(vals), sum(vals)/len(vals), min(vals), max(vals))
-    return elapsed
+    return fetch
 
 
-def q_filtered(session, schema, device_id, method='allow_filtering'):
+def q_filtered(session, schema, device_id, method='allow_filtering', fetch_size=DEFAULT_FETCH_SIZE):
     if method == 'mv':
         if schema == 'hourly':
             bh = int(dt.datetime.now(dt.timezone.utc).replace(minute=0, second=0, microsecond=0).timestamp() // 3600)
-            cql = "SELECT * FROM telemetry_hourly_mv_power WHERE device_id=%s AND bucket_hour=%s AND power_output > %s LIMIT 100"
+            cql = "SELECT * FROM telemetry_hourly_mv_power WHERE device_id=? AND bucket_hour=? AND power_output > ? LIMIT 100"
             params = (device_id, bh, 900)
         elif schema == 'daily':
             bd = dt.date.today()
-            cql = "SELECT * FROM telemetry_daily_mv_power WHERE device_id=%s AND bucket_date=%s AND power_output > %s LIMIT 100"
+            cql = "SELECT * FROM telemetry_daily_mv_power WHERE device_id=? AND bucket_date=? AND power_output > ? LIMIT 100"
             params = (device_id, bd, 900)
         else:
-            cql = "SELECT * FROM telemetry_simple_mv_power WHERE device_id=%s AND power_output > %s LIMIT 100"
+            cql = "SELECT * FROM telemetry_simple_mv_power WHERE device_id=? AND power_output > ? LIMIT 100"
             params = (device_id, 900)
     else:
         if schema == 'hourly':
             bh = int(dt.datetime.now(dt.timezone.utc).replace(minute=0, second=0, microsecond=0).timestamp() // 3600)
-            cql = "SELECT * FROM telemetry_hourly WHERE device_id=%s AND bucket_hour=%s AND power_output > %s ALLOW FILTERING"
+            cql = "SELECT * FROM telemetry_hourly WHERE device_id=? AND bucket_hour=? AND power_output > ? ALLOW FILTERING"
             params = (device_id, bh, 900)
         elif schema == 'daily':
             bd = dt.date.today()
-            cql = "SELECT * FROM telemetry_daily WHERE device_id=%s AND bucket_date=%s AND power_output > %s ALLOW FILTERING"
+            cql = "SELECT * FROM telemetry_daily WHERE device_id=? AND bucket_date=? AND power_output > ? ALLOW FILTERING"
             params = (device_id, bd, 900)
         else:
-            cql = "SELECT * FROM telemetry_simple WHERE device_id=%s AND power_output > %s ALLOW FILTERING"
+            cql = "SELECT * FROM telemetry_simple WHERE device_id=? AND power_output > ? ALLOW FILTERING"
             params = (device_id, 900)
-    start = time.perf_counter()
-    rows = session.execute(cql, params)
-    elapsed = (time.perf_counter() - start) * 1000.0
-    _ = list(rows)
-    return elapsed
-
-
-def run_one(schema, session, iters):
-    results = {'latest':[], 'range6':[], 'daily':[], 'filtered_af':[], 'filtered_mv':[]}
-    device = REACTORS[0]
-    for _ in tqdm(range(iters), desc=f"Benchmark {schema}"):
-        results['latest'].append(q_latest(session, schema, device))
-        results['range6'].append(q_time_range(session, schema, device, hours=6))
-        results['daily'].append(q_daily_agg(session, schema, device))
-        results['filtered_af'].append(q_filtered(session, schema, device, method='allow_filtering'))
-        results['filtered_mv'].append(q_filtered(session, schema, device, method='mv'))
+    return fetch_all(session, cql, params, fetch_size)
+
+
+def run_one(schema, session, args):
+    """
+    Loads each query at each fetch size in turn; returns its latency histogram
+    summary (ms, until the last row is read). With more than one fetch size
+    the results are keyed `query@fetch_size`.
+    """
     out = {}
-    for k,v in results.items():
-        out[k] = percentiles(v)
+    phases = [(name, fs) for name in QUERIES for fs in args.fetch_sizes]
+    for name, fetch_size in tqdm(phases, desc=f"Benchmark {schema} ({args.mode})"):
+        query = QUERIES[name]
+        key = name if len(args.fetch_sizes) == 1 else f'{name}@{fetch_size}'
+
+        def call(client, query=query, fetch_size=fetch_size):
+            # each client sticks to one device, so clients spread over partitions
+            return query(session, schema, REACTORS[client % len(REACTORS)], fetch_size)
+
+        if args.mode == 'open':
+            result = open_loop(call, rate=args.rate, duration=args.duration, workers=args.workers, warmup=args.warmup)
+        else:
+            result = closed_loop(call, clients=args.clients, iters=None if args.duration else args.iters,
+                                 duration=args.duration, warmup=args.warmup)
+        out[key] = {'mode': args.mode, 'clients': args.clients, 'fetch_size': fetch_size, **result.to_dict()}
+        if args.mode == 'open':
+            out[key]['rate'] = args.rate
+            out[key]['workers'] = args.workers
+        if result.errors:
+            print(f"[warn] {schema}/{key}: {result.errors} errors, last: {result.last_error}")
     return out
 
 
@@ -130,17 +165,38 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--contact-points', nargs='+', default=['localhost'])
     parser.add_argument('--keyspace', default='npp_lab3')
-    parser.add_argument('--iters', type=int, default=50)
+    parser.add_argument('--schemas', nargs='+', choices=['simple', 'hourly', 'daily'], default=['simple', 'hourly', 'daily'])
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed',
+                        help="closed: clients send back to back; open: requests arrive at --rate")
+    parser.add_argument('--clients', type=int, default=1, help="Concurrent clients in the closed loop")
+    parser.add_argument('--iters', type=int, default=50, help="Queries per client in the closed loop")
+    parser.add_argument('--duration', type=float, default=None,
+                        help="Seconds per query; required for the open loop, replaces --iters in the closed loop")
+    parser.add_argument('--rate', type=float, default=None, help="Requests per second in the open loop")
+    parser.add_argument('--workers', type=int, default=32,
+                        help="Worker threads of the open loop; it keeps up only while rate x latency stays below this")
+    parser.add_argument('--warmup', type=float, default=0.0, help="Seconds of load per query not recorded")
+    parser.add_argument('--fetch-sizes', nargs='+', type=int, default=[DEFAULT_FETCH_SIZE],
+                        help="Page sizes to sweep; every query runs once per size")
+    parser.add_argument('--output', help="Also write the results JSON here")
     args = parser.parse_args()
+    if args.mode == 'open' and not (args.rate and args.duration):
+        parser.error("--mode open needs --rate and --duration")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
 
     cluster = Cluster(args.contact_points)
     session = cluster.connect(args.keyspace)
-    schemas = ['simple','hourly','daily']
-    import json
     all_results = {}
-    for s in schemas:
-        out = run_one(s, session, args.iters)
+    for s in args.schemas:
+        out = run_one(s, session, args)
         all_results[s] = out
     print(json.dumps(all_results, indent=2))
+    stats = statements(session).stats()
+    print(f"[info] {stats['statements']} prepared statements, {stats['hits']:,} cache hits, "
+          f"{stats['misses']} prepares", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(all_results, f, indent=2)
     session.shutdown()
     cluster.shutdown()
@@ -0,0 +1,183 @@
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+
+from cassandra import ProtocolVersion, cqltypes
+from cassandra.protocol import ColumnMetadata
+from cassandra.query import BatchStatement, PreparedStatement
+
+# column types of the lab3 telemetry tables (see tables.py)
+COLUMN_TYPES = {
+    'device_id': cqltypes.UTF8Type,
+    'bucket_hour': cqltypes.Int32Type,
+    'bucket_date': cqltypes.SimpleDateType,
+    'ts': cqltypes.DateType,
+    'sensor_id': cqltypes.UTF8Type,
+    'core_temp': cqltypes.FloatType,
+    'pressure': cqltypes.FloatType,
+    'neutron_flux': cqltypes.DoubleType,
+    'power_output': cqltypes.DoubleType,
+    'status': cqltypes.UTF8Type,
+}
+
+PARTITION_KEY_COLUMNS = ('device_id', 'bucket_hour', 'bucket_date')
+
+_INSERT = re.compile(r'INSERT\s+INTO\s+(\w+)\s*\(([^)]*)\)', re.IGNORECASE)
+_SELECT = re.compile(r'FROM\s+(\w+)', re.IGNORECASE)
+# the column compared against each bind marker of a WHERE clause
+_MARKER = re.compile(r'(\w+)\s*(?:=|>=|<=|>|<)\s*\?')
+
+
+class FakeResponseFuture:
+    def __init__(self):
+        self._callbacks = []
+        self._result = None
+        self._error = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def add_callbacks(self, callback, errback, callback_args=(), errback_args=()):
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append((callback, errback, callback_args, errback_args))
+                return
+        self._fire(callback, errback, callback_args, errback_args)
+
+    def result(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _complete(self, result, error):
+        with self._lock:
+            self._result, self._error = result, error
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for cb in callbacks:
+            self._fire(*cb)
+
+    def _fire(self, callback, errback, callback_args, errback_args):
+        if self._error is not None:
+            errback(self._error, *errback_args)
+        else:
+            callback(self._result, *callback_args)
+
+
+class FakeResultSet:
+    """Pages `rows` by the statement's fetch_size; each further page costs a round trip."""
+
+    def __init__(self, session, rows, fetch_size):
+        self._session = session
+        self._rows = rows
+        # batches and plain strings carry no (integer) fetch_size
+        self._fetch_size = fetch_size if isinstance(fetch_size, int) and fetch_size > 0 else max(1, len(rows))
+        self._start = 0
+        self.current_rows = rows[:self._fetch_size]
+
+    @property
+    def has_more_pages(self):
+        return self._start + self._fetch_size < len(self._rows)
+
+    def fetch_next_page(self):
+        time.sleep(self._session._delay())
+        self._start += self._fetch_size
+        self.current_rows = self._rows[self._start:self._start + self._fetch_size]
+
+    def __iter__(self):
+        while True:
+            yield from self.current_rows
+            if not self.has_more_pages:
+                return
+            self.fetch_next_page()
+
+
+class FakeSession:
+    """
+    Stands in for a cassandra Session without a cluster. Inserts are prepared
+    into real PreparedStatements (so binding costs the same), requests finish
+    after `latency_ms` (+/- `jitter`) on one timer thread, and every
+    `fail_every`-th request fails. Counts what it was sent.
+    """
+
+    def __init__(self, latency_ms=1.0, jitter=0.5, fail_every=0, rows=None):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter
+        self.fail_every = fail_every
+        # what SELECTs return; a callable gets (query, params)
+        self.rows = rows if rows is not None else []
+        self.requests = 0
+        self.statements = 0
+        # distinct partitions written by each batch
+        self.partitions = []
+        self._partition_keys = {}
+        self._ids = itertools.count()
+        self._heap = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._timer = threading.Thread(target=self._run_timer, daemon=True)
+        self._timer.start()
+
+    def prepare(self, query):
+        m = _INSERT.search(query)
+        if m:
+            table, columns = m.group(1), [c.strip() for c in m.group(2).split(',')]
+        else:
+            m = _SELECT.search(query)
+            table, columns = (m.group(1) if m else ''), _MARKER.findall(query)
+        meta = [ColumnMetadata('fake', table, c, COLUMN_TYPES[c]) for c in columns]
+        pk = [i for i, c in enumerate(columns) if c in PARTITION_KEY_COLUMNS]
+        query_id = f'fake-{next(self._ids)}'.encode()
+        self._partition_keys[query_id] = pk
+        return PreparedStatement(meta, query_id, pk, query, 'fake', ProtocolVersion.V4, [], None)
+
+    def execute(self, query, parameters=None, **kwargs):
+        return self.execute_async(query, parameters, **kwargs).result()
+
+    def execute_async(self, query, parameters=None, **kwargs):
+        future = FakeResponseFuture()
+        with self._cond:
+            self.requests += 1
+            n = self.requests
+            if isinstance(query, BatchStatement):
+                self.statements += len(query._statements_and_parameters)
+                self.partitions.append(len({
+                    (query_id, *(values[i] for i in self._partition_keys.get(query_id, [])))
+                    for _, query_id, values in query._statements_and_parameters
+                }))
+            else:
+                self.statements += 1
+            error = RuntimeError('simulated request failure') if self.fail_every and n % self.fail_every == 0 else None
+            result = None
+            if error is None:
+                rows = self.rows(query, parameters) if callable(self.rows) else self.rows
+                result = FakeResultSet(self, list(rows), getattr(query, 'fetch_size', None))
+            heapq.heappush(self._heap, (time.perf_counter() + self._delay(), next(self._ids), future, result, error))
+            self._cond.notify()
+        return future
+
+    def _delay(self):
+        return self.latency * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _run_timer(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._heap:
+                    return
+                due, _, future, result, error = self._heap[0]
+                wait = due - time.perf_counter()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+            future._complete(result, error)
@@ -1,12 +1,15 @@
 import argparse
-import time
-import random
 from datetime import datetime, timedelta, timezone
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from cassandra.cluster import Cluster
 from cassandra.query import BatchType, BatchStatement
 from cassandra import ConsistencyLevel
 
+from common.statements import statements
+from fake_session import FakeSession
+from ingest import IngestEngine, time_slices
+from synth import slice_rows, synthesize
+
 
 def make_session(contact_points, keyspace):
     cluster = Cluster(contact_points)
@@ -38,57 +41,51 @@ def prepare_statements(session, schema):
     else:
         raise ValueError(f"Unknown schema '{schema}'")
 
-    ps = session.prepare(query)
-    ps.consistency_level = ConsistencyLevel.ONE
-    return ps
-
-
-def generate_rows_for_device(start_dt, end_dt, interval_seconds):
-    ts = start_dt
-    sensor_ids = ['sensor_core', 'sensor_pressure', 'sensor_flux', 'sensor_power']
-
-    while ts < end_dt:
-        core_temp = random.uniform(280.0, 340.0)          # °C
-        pressure = random.uniform(60.0, 80.0)             # atm
-        neutron_flux = random.uniform(1e12, 5e13)         # n/cm2*s
-        power_output = random.uniform(600.0, 1000.0)      # MWe
-        status = 'OK' if random.random() > 0.001 else 'ALARM'
-        sensor_id = random.choice(sensor_ids)
-        yield (ts, sensor_id, core_temp, pressure, neutron_flux, power_output, status)
-        ts += timedelta(seconds=interval_seconds)
-
-
-def chunked(iterable, n):
-    chunk = []
-    for item in iterable:
-        chunk.append(item)
-        if len(chunk) >= n:
-            yield chunk
-            chunk = []
-    if chunk:
-        yield chunk
-
-
-def insert_rows(session, schema, device_id, start_dt, end_dt, interval_seconds, batch_size):
-    ps = prepare_statements(session, schema)
-    inserted = 0
-
-    for chunk in chunked(generate_rows_for_device(start_dt, end_dt, interval_seconds), batch_size):
-        batch = BatchStatement(batch_type=BatchType.UNLOGGED)
-        for (ts, sensor_id, core_temp, pressure, neutron_flux, power_output, status) in chunk:
-            if schema == 'simple':
-                batch.add(ps, (device_id, ts, sensor_id, core_temp, pressure, neutron_flux, power_output, status))
-            elif schema == 'hourly':
-                bucket_hour = int(ts.replace(tzinfo=timezone.utc).timestamp() // 3600)
-                batch.add(ps, (device_id, bucket_hour, ts, sensor_id, core_temp, pressure, neutron_flux, power_output, status))
-            elif schema == 'daily':
-                bucket_date = ts.date()
-                batch.add(ps, (device_id, bucket_date, ts, sensor_id, core_temp, pressure, neutron_flux, power_output, status))
-        session.execute(batch)
-        inserted += len(chunk)
-
-    print(f"[done] device={device_id}, inserted={inserted}")
-    return inserted
+    return statements(session).prepare(query, consistency_level=ConsistencyLevel.ONE, idempotent=True)
+
+
+def partition_batches(rows, partitions, sizes, max_rows, max_bytes):
+    """
+    Groups rows into batches that each hold a single partition, closing a
+    batch when the partition changes or it reaches `max_rows` rows or
+    `max_bytes` encoded bytes. A row bigger than `max_bytes` goes alone.
+    """
+    batch, key, size = [], None, 0
+    for values, row_key, row_size in zip(rows, partitions, sizes):
+        if batch and (row_key != key or len(batch) >= max_rows or size + row_size > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(values)
+        key = row_key
+        size += row_size
+    if batch:
+        yield batch
+
+
+def insert_rows(engine, ps, chunk, batch_size, batch_bytes):
+    """Queues a RowChunk as async batches; returns the rows queued."""
+    queued = 0
+
+    for rows in partition_batches(chunk.rows(), chunk.partitions.tolist(), chunk.sizes.tolist(), batch_size, batch_bytes):
+        if len(rows) == 1:
+            # a batch of one is just overhead
+            engine.submit(ps.bind(rows[0]), 1)
+        else:
+            batch = BatchStatement(batch_type=BatchType.UNLOGGED)
+            for values in rows:
+                batch.add(ps, values)
+            engine.submit(batch, len(rows))
+        queued += len(rows)
+
+    return queued
+
+
+def write_slice(engine, ps, schema, device_id, start_dt, end_dt, interval_seconds, batch_size, batch_bytes, synth_pool=None):
+    """Synthesizes one slice of a device's rows (in `synth_pool` if given) and queues them."""
+    start_ms, count = slice_rows(start_dt, end_dt, interval_seconds)
+    spec = (schema, device_id, start_ms, count, interval_seconds * 1000)
+    chunk = synth_pool.submit(synthesize, *spec).result() if synth_pool else synthesize(*spec)
+    return insert_rows(engine, ps, chunk, batch_size, batch_bytes)
 
 
 def main():
@@ -99,11 +96,24 @@ def main():
     parser.add_argument('--devices', type=int, default=4)
     parser.add_argument('--days', type=int, default=30)
     parser.add_argument('--interval-seconds', type=int, default=10)
-    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=50, help="Max rows per batch")
+    parser.add_argument('--batch-bytes', type=int, default=5 * 1024,
+                        help="Max encoded bytes per batch (Cassandra warns above 5 KiB by default)")
     parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--max-in-flight', type=int, default=64, help="Async requests outstanding at once")
+    parser.add_argument('--slice-hours', type=float, default=24, help="Each device's range is split into slices this long")
+    parser.add_argument('--report-every', type=float, default=5.0, help="Seconds between progress lines (0 = off)")
+    parser.add_argument('--synth-processes', type=int, default=0,
+                        help="Processes synthesizing rows for the writers (0 = in the worker threads)")
+    parser.add_argument('--fake', action='store_true', help="Use an in-process fake session instead of a cluster")
+    parser.add_argument('--fake-latency-ms', type=float, default=1.0)
     args = parser.parse_args()
 
-    session = make_session(args.contact_points, args.keyspace)
+    if args.fake:
+        session = FakeSession(latency_ms=args.fake_latency_ms)
+    else:
+        session = make_session(args.contact_points, args.keyspace)
+    ps = prepare_statements(session, args.schema)
 
     devices = [f'reactor_{i+1}' for i in range(args.devices)]
     end_dt = datetime.now(timezone.utc)
@@ -111,32 +121,52 @@ def main():
 
     total_expected = int((args.days * 24 * 3600 / args.interval_seconds) * args.devices)
     print(f"[info] Generating ~{total_expected:,} rows across {args.devices} devices...")
-    print(f"[info] Schema={args.schema}, batch_size={args.batch_size}, workers={args.workers}")
-
-    start = time.perf_counter()
-    total_inserted = 0
+    print(f"[info] Schema={args.schema}, batch_size={args.batch_size}, batch_bytes={args.batch_bytes}, workers={args.workers}, "
+          f"max_in_flight={args.max_in_flight}, slice_hours={args.slice_hours:g}, synth_processes={args.synth_processes}")
+
+    # slices of all devices interleaved, so every worker has something to do
+    # and the early slices of each device are written first
+    slices = time_slices(start_dt, end_dt, args.interval_seconds, args.slice_hours * 3600)
+    tasks = [(device_id, lo, hi) for lo, hi in slices for device_id in devices]
+
+    engine = IngestEngine(session, max_in_flight=args.max_in_flight, report_every=args.report_every).start()
+    # each worker waits on at most one slice, so at most `workers` chunks are in memory
+    synth_pool = ProcessPoolExecutor(args.synth_processes) if args.synth_processes else None
+    total_queued = 0
     futures = []
 
     with ThreadPoolExecutor(max_workers=args.workers) as executor:
-        for device_id in devices:
+        for device_id, lo, hi in tasks:
             f = executor.submit(
-                insert_rows,
-                session,
+                write_slice,
+                engine,
+                ps,
                 args.schema,
                 device_id,
-                start_dt,
-                end_dt,
+                lo,
+                hi,
                 args.interval_seconds,
-                args.batch_size
+                args.batch_size,
+                args.batch_bytes,
+                synth_pool
             )
             futures.append(f)
 
         for f in as_completed(futures):
-            total_inserted += f.result()
-
-    elapsed = time.perf_counter() - start
-    print(f"\nInserted total {total_inserted:,} rows in {elapsed:.1f}s "
-          f"({total_inserted/elapsed:.1f} rows/sec)")
+            total_queued += f.result()
+
+    if synth_pool is not None:
+        synth_pool.shutdown()
+
+    elapsed = engine.stop()
+    lat = engine.latency.summary()
+    print(f"\nInserted total {engine.rows:,} rows in {elapsed:.1f}s "
+          f"({engine.rows/elapsed:.1f} rows/sec) over {engine.requests:,} requests")
+    print(f"Request latency ms: avg={lat['avg']:.2f} p50={lat['p50']:.2f} p95={lat['p95']:.2f} "
+          f"p99={lat['p99']:.2f} p999={lat['p999']:.2f} max={lat['max']:.2f}")
+    if engine.errors:
+        print(f"[warn] {engine.errors} requests failed ({total_queued - engine.rows:,} rows), "
+              f"last error: {engine.last_error}")
 
     session.shutdown()
 
@@ -0,0 +1,144 @@
+import threading
+import time
+from datetime import timedelta
+
+from common.histogram import LatencyHistogram
+
+
+class IngestEngine:
+    """
+    Sends statements with `execute_async`, keeping at most `max_in_flight`
+    requests outstanding across all producer threads. Tracks rows, errors and
+    request latency, and prints progress every `report_every` seconds.
+    """
+
+    def __init__(self, session, max_in_flight=64, report_every=5.0):
+        self.session = session
+        self.max_in_flight = max_in_flight
+        self.report_every = report_every
+        self.rows = 0
+        self.requests = 0
+        self.errors = 0
+        self.last_error = None
+        self.latency = LatencyHistogram()
+        self._window = threading.Semaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._stop = threading.Event()
+        self._reporter = None
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self.report_every:
+            self._reporter = threading.Thread(target=self._report_loop, daemon=True)
+            self._reporter.start()
+        return self
+
+    def submit(self, statement, rows, parameters=None):
+        """Blocks while the window is full, then sends `statement` (worth `rows` rows)."""
+        self._window.acquire()
+        with self._lock:
+            self._in_flight += 1
+        sent_at = time.perf_counter()
+        try:
+            future = self.session.execute_async(statement, parameters)
+        except Exception as e:
+            self._on_error(e, sent_at)
+            raise
+        future.add_callbacks(self._on_success, self._on_error, callback_args=(sent_at, rows), errback_args=(sent_at,))
+
+    def wait(self):
+        """Blocks until every submitted request has finished."""
+        with self._idle:
+            while self._in_flight:
+                self._idle.wait()
+
+    def stop(self):
+        self.wait()
+        self._stop.set()
+        if self._reporter is not None:
+            self._reporter.join()
+        return self.elapsed()
+
+    def elapsed(self):
+        return time.perf_counter() - self._start if self._start is not None else 0.0
+
+    def summary(self):
+        elapsed = self.elapsed()
+        return {
+            'rows': self.rows,
+            'requests': self.requests,
+            'errors': self.errors,
+            'elapsed_s': elapsed,
+            'rows_per_sec': self.rows / elapsed if elapsed else 0.0,
+            'request_latency_ms': self.latency.summary(),
+        }
+
+    def _on_success(self, _result, sent_at, rows):
+        latency = time.perf_counter() - sent_at
+        with self._lock:
+            self.rows += rows
+            self.requests += 1
+            self.latency.record(latency)
+            self._finish()
+
+    def _on_error(self, error, sent_at):
+        with self._lock:
+            self.errors += 1
+            self.requests += 1
+            self.last_error = error
+            self._finish()
+
+    def _finish(self):
+        # called with the lock held
+        self._in_flight -= 1
+        self._window.release()
+        if not self._in_flight:
+            self._idle.notify_all()
+
+    def _report_loop(self):
+        last_rows, last_t = 0, time.perf_counter()
+        seen = LatencyHistogram()
+        while not self._stop.wait(self.report_every):
+            now = time.perf_counter()
+            with self._lock:
+                rows = self.rows
+                errors = self.errors
+                # latency of just this interval: everything so far minus what was already reported
+                interval = _difference(self.latency, seen)
+                seen = _copy(self.latency)
+            rate = (rows - last_rows) / (now - last_t)
+            lat = interval.summary()
+            print(f"[progress] rows={rows:,} ({rate:,.0f} rows/sec) errors={errors} "
+                  f"request p50={lat['p50']:.1f}ms p95={lat['p95']:.1f}ms p99={lat['p99']:.1f}ms")
+            last_rows, last_t = rows, now
+
+
+def _copy(hist):
+    out = LatencyHistogram()
+    out.merge(hist)
+    return out
+
+
+def _difference(total, seen):
+    out = LatencyHistogram()
+    out.counts = total.counts - seen.counts
+    out.total = total.total - seen.total
+    out.sum_us = total.sum_us - seen.sum_us
+    out.max_us = total.max_us
+    return out
+
+
+def time_slices(start_dt, end_dt, interval_seconds, slice_seconds):
+    """Splits [start_dt, end_dt) into slices whose starts stay on the row grid."""
+    step = max(1, int(slice_seconds // interval_seconds)) * interval_seconds
+    slices = []
+    t = start_dt
+    while t < end_dt:
+        nxt = min(end_dt, t + timedelta(seconds=step))
+        slices.append((t, nxt))
+        t = nxt
+    return slices
+
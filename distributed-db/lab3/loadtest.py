@@ -0,0 +1,153 @@
+import queue
+import threading
+import time
+
+from common.histogram import LatencyHistogram
+
+
+class PhaseResult:
+    """
+    Latencies of one query under load. `latency` is what a caller sees: in the
+    open loop it counts from the moment the request was scheduled, so time
+    spent queued behind slow requests is included (coordinated-omission
+    correction). `service` is the time of the call itself. Calls that return a
+    fetch (first_row, pages, rows) also add to `first_row` and the page/row
+    counts.
+    """
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.service = LatencyHistogram()
+        self.first_row = LatencyHistogram()
+        self.pages = 0
+        self.max_pages = 0
+        self.rows = 0
+        self.errors = 0
+        self.last_error = None
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency, service, fetch=None):
+        with self._lock:
+            self.latency.record(latency)
+            self.service.record(service)
+            if fetch is not None:
+                self.first_row.record(fetch.first_row)
+                self.pages += fetch.pages
+                self.max_pages = max(self.max_pages, fetch.pages)
+                self.rows += fetch.rows
+
+    def error(self, e):
+        with self._lock:
+            self.errors += 1
+            self.last_error = e
+
+    def to_dict(self):
+        out = self.latency.summary()
+        out['throughput'] = self.latency.total / self.elapsed if self.elapsed else 0.0
+        out['errors'] = self.errors
+        out['service'] = self.service.summary()
+        if self.first_row.total:
+            n = self.first_row.total
+            out['first_row'] = self.first_row.summary()
+            out['pages_avg'] = self.pages / n
+            out['pages_max'] = self.max_pages
+            out['rows_avg'] = self.rows / n
+        return out
+
+
+def _call(fn, client):
+    start = time.perf_counter()
+    fetch = fn(client)
+    return time.perf_counter() - start, fetch
+
+
+def closed_loop(fn, clients=1, iters=None, duration=None, warmup=0.0):
+    """
+    `clients` threads each call `fn(client)` back to back, for `iters` calls
+    each or until `duration` seconds pass. Calls that start within the first
+    `warmup` seconds are not recorded.
+    """
+    result = PhaseResult()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration if duration else None
+
+    def client_loop(client):
+        n = 0
+        while True:
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                return
+            if iters is not None and now >= measure_from and n >= iters:
+                return
+            try:
+                elapsed, fetch = _call(fn, client)
+            except Exception as e:
+                if now >= measure_from:
+                    result.error(e)
+                    n += 1
+                continue
+            if now >= measure_from:
+                result.record(elapsed, elapsed, fetch)
+                n += 1
+
+    threads = [threading.Thread(target=client_loop, args=(c,)) for c in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    result.elapsed = time.perf_counter() - measure_from
+    return result
+
+
+def open_loop(fn, rate, duration, workers=32, warmup=0.0):
+    """
+    Schedules `fn(client)` at a fixed `rate` per second for `duration` seconds
+    (after `warmup`) and runs the calls on `workers` threads. A request's
+    latency is measured from its scheduled time, not from when a worker got
+    to it, so a stalled server shows up in the percentiles instead of
+    silently lowering the request rate.
+    """
+    result = PhaseResult()
+    pending = queue.Queue()
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    measure_from = start + warmup
+    end = measure_from + duration
+
+    def worker(client):
+        while True:
+            intended = pending.get()
+            if intended is None:
+                return
+            try:
+                service, fetch = _call(fn, client)
+            except Exception as e:
+                if intended >= measure_from:
+                    result.error(e)
+                continue
+            if intended >= measure_from:
+                result.record(time.perf_counter() - intended, service, fetch)
+
+    threads = [threading.Thread(target=worker, args=(c,)) for c in range(workers)]
+    for t in threads:
+        t.start()
+
+    k = 0
+    while True:
+        intended = start + k * interval
+        if intended >= end:
+            break
+        delay = intended - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pending.put(intended)
+        k += 1
+
+    for _ in threads:
+        pending.put(None)
+    for t in threads:
+        t.join()
+    result.elapsed = time.perf_counter() - measure_from
+    return result
@@ -0,0 +1,97 @@
+import itertools
+import math
+
+import numpy as np
+from cassandra.cqltypes import SimpleDateType
+
+SENSOR_IDS = np.array(['sensor_core', 'sensor_pressure', 'sensor_flux', 'sensor_power'])
+STATUSES = np.array(['OK', 'ALARM'])
+
+# INSERT column order of each schema (see generator.prepare_statements)
+COLUMNS = {
+    'simple': ['device_id', 'ts', 'sensor_id', 'core_temp', 'pressure', 'neutron_flux', 'power_output', 'status'],
+    'hourly': ['device_id', 'bucket_hour', 'ts', 'sensor_id', 'core_temp', 'pressure', 'neutron_flux', 'power_output', 'status'],
+    'daily': ['device_id', 'bucket_date', 'ts', 'sensor_id', 'core_temp', 'pressure', 'neutron_flux', 'power_output', 'status'],
+}
+
+# encoded bytes of the fixed-width columns; every value also carries a 4-byte
+# length prefix in the protocol
+FIXED_SIZES = {
+    'bucket_hour': 4, 'bucket_date': 4, 'ts': 8,
+    'core_temp': 4, 'pressure': 4, 'neutron_flux': 8, 'power_output': 8,
+}
+VALUE_OVERHEAD = 4
+
+MS_PER_HOUR = 3600 * 1000
+MS_PER_DAY = 24 * MS_PER_HOUR
+
+_SENSOR_LEN = np.array([len(s) for s in SENSOR_IDS])
+_STATUS_LEN = np.array([len(s) for s in STATUSES])
+
+
+class RowChunk:
+    """
+    Consecutive rows of one device as NumPy columns in INSERT order. `ts` is in
+    epoch milliseconds and `bucket_date` in the driver's raw `date` encoding:
+    days since the epoch shifted by 2**31 (SimpleDateType.EPOCH_OFFSET_DAYS),
+    which is what SimpleDateType expects of a bare integer. `partitions`
+    numbers the partition of each row and `sizes` is each row's encoded size
+    in bytes.
+    """
+
+    def __init__(self, schema, device_id, columns, partitions, sizes):
+        self.schema = schema
+        self.device_id = device_id
+        self.columns = columns
+        self.partitions = partitions
+        self.sizes = sizes
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def rows(self):
+        """Bound-value tuples, built column-wise."""
+        n = len(self)
+        return list(zip(*(
+            itertools.repeat(self.device_id, n) if name == 'device_id' else self.columns[name].tolist()
+            for name in COLUMNS[self.schema]
+        )))
+
+
+def slice_rows(start_dt, end_dt, interval_seconds):
+    """(start ms, row count) of the rows at start_dt + k*interval before end_dt."""
+    count = math.ceil((end_dt - start_dt).total_seconds() / interval_seconds)
+    return int(start_dt.timestamp() * 1000), max(0, count)
+
+
+def synthesize(schema, device_id, start_ms, count, interval_ms, seed=None):
+    """Draws `count` rows of one device, `interval_ms` apart from `start_ms`."""
+    rng = np.random.default_rng(seed)
+    ts = start_ms + np.arange(count, dtype=np.int64) * interval_ms
+    sensor = rng.integers(0, len(SENSOR_IDS), count)
+    alarm = (rng.random(count) <= 0.001).astype(np.intp)
+    columns = {
+        'ts': ts,
+        'sensor_id': SENSOR_IDS[sensor],
+        'core_temp': rng.uniform(280.0, 340.0, count),          # °C
+        'pressure': rng.uniform(60.0, 80.0, count),             # atm
+        'neutron_flux': rng.uniform(1e12, 5e13, count),         # n/cm2*s
+        'power_output': rng.uniform(600.0, 1000.0, count),      # MWe
+        'status': STATUSES[alarm],
+    }
+    if schema == 'hourly':
+        columns['bucket_hour'] = (ts // MS_PER_HOUR).astype(np.int32)
+        partitions = columns['bucket_hour']
+    elif schema == 'daily':
+        days = ts // MS_PER_DAY
+        columns['bucket_date'] = days + SimpleDateType.EPOCH_OFFSET_DAYS
+        partitions = days
+    elif schema == 'simple':
+        partitions = np.zeros(count, dtype=np.int64)
+    else:
+        raise ValueError(f"Unknown schema '{schema}'")
+
+    fixed = sum(FIXED_SIZES.get(name, 0) for name in COLUMNS[schema])
+    fixed += VALUE_OVERHEAD * len(COLUMNS[schema]) + len(device_id.encode())
+    sizes = fixed + _SENSOR_LEN[sensor] + _STATUS_LEN[alarm]
+    return RowChunk(schema, device_id, columns, partitions, sizes)
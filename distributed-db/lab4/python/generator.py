@@ -1,10 +1,31 @@
+import argparse
 import json
+import os
 import time
 import random
 from kafka import KafkaProducer
 
+from common.codec import SchemaRegistry, Serializer
+
 KAFKA_TOPIC = 'npp-raw-telemetry'
 KAFKA_BOOTSTRAP_SERVERS = 'localhost:9092'
+SCHEMA_REGISTRY_FILE = os.environ.get('SCHEMA_REGISTRY_FILE', os.path.join(os.path.dirname(__file__), 'schemas.json'))
+
+REACTOR_SUBJECT = f"{KAFKA_TOPIC}-value"
+REACTOR_SCHEMA = {
+    "name": "ReactorTelemetry",
+    "fields": [
+        {"name": "unit_id", "type": "string"},
+        {"name": "timestamp", "type": "i64"},
+        {"name": "neutron_flux", "type": "i32", "scale": 100},
+        {"name": "reactor_power", "type": "i32", "scale": 100},
+        {"name": "coolant_temp_inlet", "type": "i32", "scale": 100},
+        {"name": "coolant_temp_outlet", "type": "i32", "scale": 100},
+        {"name": "reactor_pressure", "type": "i32", "scale": 100},
+        {"name": "control_rod_position", "type": "u8"},
+        {"name": "radiation_level", "type": "i32", "scale": 100},
+    ],
+}
 
 NPP_CONFIG = [
     {"name": "Zaporizhzhia", "units": 6, "code": "ZNPP"},
@@ -72,11 +93,17 @@ class ReactorUnit:
             "radiation_level": round(self.radiation, 2)
         }
 
-def run_producer():
+def value_serializer(value_format):
+    """JSON for the stream processor; 'binary' uses the schema-registry codec."""
+    if value_format == 'binary':
+        return Serializer(SchemaRegistry(SCHEMA_REGISTRY_FILE), REACTOR_SUBJECT, REACTOR_SCHEMA)
+    return lambda v: json.dumps(v).encode('utf-8')
+
+def run_producer(value_format='json'):
     try:
         producer = KafkaProducer(
             bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-            value_serializer=lambda v: json.dumps(v).encode('utf-8')
+            value_serializer=value_serializer(value_format)
         )
         print(f"Connected to Kafka at {KAFKA_BOOTSTRAP_SERVERS}")
     except Exception as e:
@@ -117,4 +144,8 @@ def run_producer():
         producer.close()
 
 if __name__ == "__main__":
-    run_producer()
+    parser = argparse.ArgumentParser(description='NPP telemetry producer')
+    parser.add_argument('--format', choices=['json', 'binary'], default='json',
+                        help='Value encoding; the stream processor reads json')
+    args = parser.parse_args()
+    run_producer(args.format)